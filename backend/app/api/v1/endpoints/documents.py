@@ -8,6 +8,7 @@ from app.core.config import settings
 from app.database import get_db
 from app.models import User, Document as DBDocument
 from app.services.document_service import process_document
+from app.services.uploads import UploadTooLargeError, spool_upload
 from app.api.deps import get_current_user
 
 router = APIRouter()
@@ -28,11 +29,11 @@ async def upload_files(
     
     total_chunks = 0
     for file in files:
-        # Save file temporarily
-        file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Spool the file to disk piece by piece instead of reading it into memory
+        try:
+            file_path, _ = await spool_upload(file, settings.UPLOAD_DIR)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         try:
             # Process the document
@@ -32,9 +32,147 @@ class Settings(BaseSettings):
     POSTMAN_COLLECTION_ID: Optional[str] = os.getenv("POSTMAN_COLLECTION_ID")
     POSTMAN_API_URL: str = "https://api.getpostman.com"
     
+    # Database Connections (for request handlers; ingestion workers and the
+    # search pool get a connection each on top, see database.py)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    SCHEMA_UPGRADE_ON_STARTUP: bool = os.getenv("SCHEMA_UPGRADE_ON_STARTUP", "true").lower() == "true"
+
     # File Storage
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploaded_docs")
-    
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))  # per file
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+    # Background Ingestion
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "100"))
+    INGEST_CONCURRENCY: int = int(os.getenv("INGEST_CONCURRENCY", str(os.cpu_count() or 2)))
+    INGEST_JOB_RETENTION: int = int(os.getenv("INGEST_JOB_RETENTION", "1000"))
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+    INGEST_PARSE_PAGE_BATCH: int = int(os.getenv("INGEST_PARSE_PAGE_BATCH", "16"))
+    # Files up to this size are parsed and chunked whole on the chunk process
+    # pool, so a multi-file upload uses every core; larger PDFs stream page by page.
+    INGEST_WHOLE_FILE_MAX_BYTES: int = int(os.getenv("INGEST_WHOLE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+    BULK_INSERT_METHOD: str = os.getenv("BULK_INSERT_METHOD", "executemany")  # executemany | copy
+    DUPLICATE_UPLOAD_POLICY: str = os.getenv("DUPLICATE_UPLOAD_POLICY", "link")  # link | reject | allow
+
+    # Chunking (defaults; tenants can override all but CHUNK_MAX_TOKENS)
+    CHUNK_TARGET_TOKENS: int = int(os.getenv("CHUNK_TARGET_TOKENS", "200"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", "254"))  # embedding model window minus special tokens
+    CHUNK_SPLIT_ON_HEADINGS: bool = os.getenv("CHUNK_SPLIT_ON_HEADINGS", "true").lower() == "true"
+    CHUNK_RESPECT_PARAGRAPHS: bool = os.getenv("CHUNK_RESPECT_PARAGRAPHS", "true").lower() == "true"
+    CHUNK_PREPEND_HEADING: bool = os.getenv("CHUNK_PREPEND_HEADING", "true").lower() == "true"
+
+    # Worker Pools
+    PARSE_POOL_SIZE: int = int(os.getenv("PARSE_POOL_SIZE", "2"))
+    PARSE_POOL_KIND: str = os.getenv("PARSE_POOL_KIND", "thread")  # thread | process
+    SEARCH_POOL_SIZE: int = int(os.getenv("SEARCH_POOL_SIZE", "4"))
+    RERANK_POOL_SIZE: int = int(os.getenv("RERANK_POOL_SIZE", "1"))
+    CHUNK_POOL_SIZE: int = int(os.getenv("CHUNK_POOL_SIZE", str(os.cpu_count() or 2)))
+    EMBED_POOL_SIZE: int = int(os.getenv("EMBED_POOL_SIZE", "1"))
+
+    # LLM
+    OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    OLLAMA_BASE_URLS: str = os.getenv("OLLAMA_BASE_URLS", "")  # comma-separated replicas; overrides OLLAMA_BASE_URL
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "mistral")
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+    LLM_KEEPALIVE_SECONDS: float = float(os.getenv("LLM_KEEPALIVE_SECONDS", "30"))
+    LLM_MAX_IN_FLIGHT_PER_MODEL: int = int(os.getenv("LLM_MAX_IN_FLIGHT_PER_MODEL", "4"))
+    LLM_MAX_QUEUE_PER_MODEL: int = int(os.getenv("LLM_MAX_QUEUE_PER_MODEL", "32"))
+    LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_READ_TIMEOUT: float = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    LLM_GENERATION_TIMEOUT: float = float(os.getenv("LLM_GENERATION_TIMEOUT", "300"))
+
+    # LLM Routing
+    LLM_PLAN_MODELS: str = os.getenv("LLM_PLAN_MODELS", "")  # e.g. "basic=phi3,pro=mistral,enterprise=llama3:70b|mistral"
+    LLM_FALLBACK_MODEL: str = os.getenv("LLM_FALLBACK_MODEL", "")  # smaller model tried when the plan's models are saturated
+    LLM_MODEL_CONTEXT_TOKENS: str = os.getenv("LLM_MODEL_CONTEXT_TOKENS", "")  # e.g. "phi3=4096,mistral=8192"
+    LLM_FALLBACK_QUEUE_DEPTH: int = int(os.getenv("LLM_FALLBACK_QUEUE_DEPTH", "2"))
+
+    # Prompt Context
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+    CONTEXT_TOKEN_BUDGETS: str = os.getenv("CONTEXT_TOKEN_BUDGETS", "")  # per model, e.g. "mistral=1500,llama3:70b=6000"
+
+    # Embedding Batching
+    EMBED_MAX_BATCH_SIZE: int = int(os.getenv("EMBED_MAX_BATCH_SIZE", "64"))
+    EMBED_MAX_WAIT_MS: float = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+    # Query Embedding Cache
+    QUERY_CACHE_ENABLED: bool = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+    QUERY_CACHE_BACKEND: str = os.getenv("QUERY_CACHE_BACKEND", "memory")  # memory | shared
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+    QUERY_CACHE_TTL_SECONDS: float = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "86400"))
+    QUERY_CACHE_PATH: str = os.getenv("QUERY_CACHE_PATH", "cache/query_embeddings.sqlite3")
+
+    # Conversation Sessions
+    SESSION_HISTORY_TOKEN_BUDGET: int = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "512"))
+    SESSION_VERBATIM_TURNS: int = int(os.getenv("SESSION_VERBATIM_TURNS", "2"))
+    SESSION_CONDENSED_TURN_TOKENS: int = int(os.getenv("SESSION_CONDENSED_TURN_TOKENS", "40"))
+    SESSION_MAX_TURNS: int = int(os.getenv("SESSION_MAX_TURNS", "20"))
+    SESSION_CACHE_MAX_SESSIONS: int = int(os.getenv("SESSION_CACHE_MAX_SESSIONS", "10000"))
+
+    # Semantic Answer Cache
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+    ANSWER_CACHE_MAX_TENANTS: int = int(os.getenv("ANSWER_CACHE_MAX_TENANTS", "1000"))
+    ANSWER_CACHE_MAX_PER_TENANT: int = int(os.getenv("ANSWER_CACHE_MAX_PER_TENANT", "256"))
+    ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+
+    # Vector Index Cache
+    INDEX_CACHE_MAX_TENANTS: int = int(os.getenv("INDEX_CACHE_MAX_TENANTS", "64"))
+    INDEX_CACHE_MAX_BYTES: int = int(os.getenv("INDEX_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # Cached indexes and answers are re-checked against the database this often,
+    # so uploads and deletes handled by another worker process are picked up.
+    INDEX_CACHE_REVALIDATE_SECONDS: float = float(os.getenv("INDEX_CACHE_REVALIDATE_SECONDS", "2"))
+    INDEX_SHARDS_ENABLED: bool = os.getenv("INDEX_SHARDS_ENABLED", "true").lower() == "true"
+    INDEX_SHARD_DIR: str = os.getenv("INDEX_SHARD_DIR", "index_shards")
+
+    # FAISS Index Tiers (chosen per tenant by vector count)
+    INDEX_TIER_APPROX_MIN: int = int(os.getenv("INDEX_TIER_APPROX_MIN", "50000"))  # below: exact flat search
+    INDEX_TIER_PQ_MIN: int = int(os.getenv("INDEX_TIER_PQ_MIN", "1000000"))  # from here: IVF-PQ
+    INDEX_TIER_MEDIUM_KIND: str = os.getenv("INDEX_TIER_MEDIUM_KIND", "hnsw")  # hnsw | ivf-flat
+    FAISS_HNSW_M: int = int(os.getenv("FAISS_HNSW_M", "32"))
+    FAISS_HNSW_EF_CONSTRUCTION: int = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+    FAISS_HNSW_EF_SEARCH: int = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+    FAISS_IVF_NLIST: int = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0 = 4 * sqrt(vector count)
+    FAISS_IVF_NPROBE: int = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+    FAISS_PQ_M: int = int(os.getenv("FAISS_PQ_M", "48"))  # sub-quantizers; must divide the dimension
+    FAISS_TRAIN_SAMPLE: int = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+
+    # Retrieval
+    RETRIEVAL_BACKEND: str = os.getenv("RETRIEVAL_BACKEND", "faiss")  # faiss | pgvector
+    SIMILARITY_METRIC: str = os.getenv("SIMILARITY_METRIC", "l2")  # l2 | cosine
+    RETRIEVAL_MIN_SCORE: float = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.0"))  # 0..1, vector hits below are dropped
+    RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "vector")  # vector | lexical | hybrid
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per retriever, before fusion
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+    RETRIEVAL_MAX_K: int = int(os.getenv("RETRIEVAL_MAX_K", "50"))
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "384"))
+    VECTOR_STORAGE: str = os.getenv("VECTOR_STORAGE", "array")  # array | float32 | float16
+
+    # Cross-encoder Reranking
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "50"))  # over-fetched before reranking
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    RERANK_TIME_BUDGET_MS: float = float(os.getenv("RERANK_TIME_BUDGET_MS", "300"))
+    RERANK_MAX_PENDING: int = int(os.getenv("RERANK_MAX_PENDING", "4"))  # skip reranking beyond this
+
+    # pgvector Backend
+    PGVECTOR_INDEX_TYPE: str = os.getenv("PGVECTOR_INDEX_TYPE", "hnsw")  # hnsw | ivfflat
+    PGVECTOR_HNSW_M: int = int(os.getenv("PGVECTOR_HNSW_M", "16"))
+    PGVECTOR_HNSW_EF_CONSTRUCTION: int = int(os.getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "64"))
+    PGVECTOR_HNSW_EF_SEARCH: int = int(os.getenv("PGVECTOR_HNSW_EF_SEARCH", "40"))
+    PGVECTOR_IVFFLAT_LISTS: int = int(os.getenv("PGVECTOR_IVFFLAT_LISTS", "100"))
+    PGVECTOR_IVFFLAT_PROBES: int = int(os.getenv("PGVECTOR_IVFFLAT_PROBES", "10"))
+    # The ANN index is shared by all tenants and filtered by user_id after the
+    # scan; iterative scans (pgvector >= 0.8) keep scanning until k rows match.
+    PGVECTOR_ITERATIVE_SCAN: str = os.getenv("PGVECTOR_ITERATIVE_SCAN", "relaxed_order")  # relaxed_order | strict_order | off
+    PGVECTOR_EXACT_SEARCH_MAX_ROWS: int = int(os.getenv("PGVECTOR_EXACT_SEARCH_MAX_ROWS", "20000"))  # smaller tenants skip the ANN index
+
     class Config:
         case_sensitive = True
 
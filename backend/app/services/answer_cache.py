@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+# (unit query vector, answer, created_at)
+_Entry = Tuple[np.ndarray, str, float]
+# (model that wrote the answer, ids of the chunks it was given)
+_Key = Tuple[Optional[str], FrozenSet[str]]
+
+
+class SemanticAnswerCache:
+    """Per-tenant cache of LLM answers for near-duplicate questions.
+
+    An entry is reused only when the new question retrieved exactly the same
+    chunks, was routed to the same model, and its embedding is within
+    ``threshold`` cosine similarity of the cached question, so the same LLM
+    would have seen the same context. Tenants are
+    evicted LRU; each tenant keeps at most ``max_per_tenant`` answers.
+
+    Callers pass the tenant's documents ``version`` (see tenant_fingerprint);
+    when it differs from the one the answers were stored under, every answer
+    for the tenant is dropped. That catches uploads and deletes handled by
+    other worker processes, which cannot call ``invalidate`` here.
+    """
+
+    def __init__(self, threshold: float, max_tenants: int, max_per_tenant: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_tenants = max_tenants
+        self.max_per_tenant = max_per_tenant
+        self.ttl_seconds = ttl_seconds
+        self._tenants: "OrderedDict[str, OrderedDict[_Key, List[_Entry]]]" = OrderedDict()
+        self._versions: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(
+        self,
+        user_id: str,
+        query_vector: np.ndarray,
+        chunk_ids: Iterable[str],
+        model: Optional[str] = None,
+        version: Optional[str] = None,
+    ) -> Optional[str]:
+        key = (model, frozenset(chunk_ids))
+        unit = _unit(query_vector)
+        now = time.time()
+        with self._lock:
+            self._check_version(user_id, version)
+            groups = self._tenants.get(user_id)
+            entries = groups.get(key) if groups is not None else None
+            if entries:
+                entries[:] = [entry for entry in entries if not self._expired(entry, now)]
+                best = max(entries, key=lambda entry: float(entry[0] @ unit), default=None)
+                if best is not None and float(best[0] @ unit) >= self.threshold:
+                    self._tenants.move_to_end(user_id)
+                    groups.move_to_end(key)
+                    self.hits += 1
+                    return best[1]
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        user_id: str,
+        query_vector: np.ndarray,
+        chunk_ids: Iterable[str],
+        answer: str,
+        model: Optional[str] = None,
+        version: Optional[str] = None,
+    ) -> None:
+        if not answer:
+            return
+        key = (model, frozenset(chunk_ids))
+        with self._lock:
+            self._check_version(user_id, version)
+            groups = self._tenants.setdefault(user_id, OrderedDict())
+            self._tenants.move_to_end(user_id)
+            groups.setdefault(key, []).append((_unit(query_vector), answer, time.time()))
+            groups.move_to_end(key)
+
+            while sum(len(entries) for entries in groups.values()) > self.max_per_tenant:
+                oldest_key = next(iter(groups))
+                groups[oldest_key].pop(0)
+                if not groups[oldest_key]:
+                    del groups[oldest_key]
+            while len(self._tenants) > self.max_tenants:
+                evicted, _ = self._tenants.popitem(last=False)
+                self._versions.pop(evicted, None)
+
+    def invalidate(self, user_id: str) -> None:
+        """Forget every answer for a tenant; called whenever its documents change."""
+        with self._lock:
+            self._versions.pop(user_id, None)
+            if self._tenants.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tenants": len(self._tenants),
+                "entries": sum(
+                    len(entries) for groups in self._tenants.values() for entries in groups.values()
+                ),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+    def _check_version(self, user_id: str, version: Optional[str]) -> None:
+        """Drop the tenant's answers if its documents changed. Caller holds the lock."""
+        if version is None:
+            return
+        if self._versions.get(user_id, version) != version and self._tenants.pop(user_id, None) is not None:
+            self.invalidations += 1
+        self._versions[user_id] = version
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry[2] > self.ttl_seconds
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    max_tenants=settings.ANSWER_CACHE_MAX_TENANTS,
+    max_per_tenant=settings.ANSWER_CACHE_MAX_PER_TENANT,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+) if settings.ANSWER_CACHE_ENABLED else None
@@ -0,0 +1,67 @@
+import csv
+import io
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+from sqlalchemy import Table, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from models import DocumentChunk, Embedding
+
+# Every row passed in must carry all of these keys; COPY gets no Python-side defaults.
+CHUNK_COLUMNS = ("id", "document_id", "content", "content_hash", "chunk_index", "page_start", "page_end")
+EMBEDDING_COLUMNS = ("id", "user_id", "chunk_id", "vector", "vector_blob", "created_at")
+
+
+def insert_chunks(db: Session, rows: List[Dict]) -> None:
+    _insert(db, DocumentChunk.__table__, CHUNK_COLUMNS, rows)
+
+
+def insert_embeddings(db: Session, rows: List[Dict]) -> None:
+    _insert(db, Embedding.__table__, EMBEDDING_COLUMNS, rows)
+
+
+def _insert(db: Session, table: Table, columns: Sequence[str], rows: List[Dict]) -> None:
+    """Write rows in the session's transaction with one statement per call.
+
+    BULK_INSERT_METHOD=copy streams them through COPY FROM STDIN when the
+    driver supports it (psycopg2); otherwise, and by default, a single
+    executemany INSERT is used, which SQLAlchemy sends as multi-row VALUES.
+    """
+    if not rows:
+        return
+    if settings.BULK_INSERT_METHOD == "copy" and db.get_bind().dialect.name == "postgresql":
+        cursor = db.connection().connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                cursor.copy_expert(
+                    f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                    _csv_buffer(columns, rows),
+                )
+                return
+        finally:
+            cursor.close()
+    db.execute(insert(table), rows)
+
+
+def _csv_buffer(columns: Sequence[str], rows: List[Dict]) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_csv_value(row[column]) for column in columns])
+    buffer.seek(0)
+    return buffer
+
+
+def _csv_value(value):
+    # An unquoted empty field is NULL in Postgres CSV
+    if value is None:
+        return ""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, (list, tuple)):
+        return "{" + ",".join(repr(float(item)) for item in value) + "}"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
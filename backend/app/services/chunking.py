@@ -0,0 +1,261 @@
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.tokens import estimate_tokens
+from models import TenantChunkingConfig
+
+TokenCounter = Callable[[str], int]
+
+# (page number, page text); page numbers start at 1, None for formats without pages
+Page = Tuple[Optional[int], str]
+
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+(\S.*)$")
+_NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*\.?|[A-Z]\.|Chapter \d+|Section \d+)\s+[A-Z][^.!?;:]{0,80}$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+_TERMINAL = (".", "!", "?", ":", ";", ",")
+_MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+
+class ChunkingConfig(BaseModel):
+    target_tokens: int = Field(default=settings.CHUNK_TARGET_TOKENS, ge=16)
+    overlap_tokens: int = Field(default=settings.CHUNK_OVERLAP_TOKENS, ge=0)
+    split_on_headings: bool = settings.CHUNK_SPLIT_ON_HEADINGS
+    respect_paragraphs: bool = settings.CHUNK_RESPECT_PARAGRAPHS
+    prepend_heading: bool = settings.CHUNK_PREPEND_HEADING
+
+
+class TextChunk(NamedTuple):
+    text: str
+    token_count: int
+    page_start: Optional[int]
+    page_end: Optional[int]
+    heading: Optional[str]
+
+
+class _Unit(NamedTuple):
+    """A sentence (or a piece of an over-long one) waiting to be packed."""
+    text: str
+    tokens: int
+    page: Optional[int]
+    paragraph_tokens: int  # tokens of the whole paragraph if this unit starts one, else 0
+
+
+def get_chunking_config(db: Session, user_id: str) -> ChunkingConfig:
+    """The tenant's chunking settings, falling back to the global defaults."""
+    row = db.query(TenantChunkingConfig).filter(TenantChunkingConfig.user_id == user_id).first()
+    if row is None:
+        return ChunkingConfig()
+    return ChunkingConfig(
+        target_tokens=row.target_tokens,
+        overlap_tokens=row.overlap_tokens,
+        split_on_headings=row.split_on_headings,
+        respect_paragraphs=row.respect_paragraphs,
+        prepend_heading=row.prepend_heading,
+    )
+
+
+def chunk_pages(
+    pages: Iterable[Page],
+    config: Optional[ChunkingConfig] = None,
+    count_tokens: TokenCounter = estimate_tokens,
+) -> Iterator[TextChunk]:
+    """Split page texts into chunks of about ``config.target_tokens`` tokens.
+
+    Chunks end on sentence boundaries, prefer paragraph boundaries and start
+    afresh at headings. Consecutive chunks in the same section share up to
+    ``overlap_tokens`` of trailing sentences. No chunk exceeds CHUNK_MAX_TOKENS,
+    the embedding model's input window: sentences longer than that are split
+    between words, unbroken runs (URLs, base64, table cells) between
+    characters, and headings are cut to half the limit. ``pages`` is consumed lazily, so chunks are produced while
+    later pages are still being extracted.
+    """
+    config = config or ChunkingConfig()
+    limit = min(config.target_tokens, settings.CHUNK_MAX_TOKENS)
+    overlap = min(config.overlap_tokens, limit // 2)
+
+    heading: Optional[str] = None
+    heading_tokens = 0
+    current: List[_Unit] = []
+    size = 0
+
+    def emit(units: List[_Unit]) -> TextChunk:
+        body = " ".join(unit.text for unit in units)
+        tokens = sum(unit.tokens for unit in units)
+        if heading and config.prepend_heading:
+            body = f"{heading}\n{body}"
+            tokens += heading_tokens
+        pages_seen = [unit.page for unit in units if unit.page is not None]
+        return TextChunk(
+            text=body,
+            token_count=tokens,
+            page_start=min(pages_seen) if pages_seen else None,
+            page_end=max(pages_seen) if pages_seen else None,
+            heading=heading,
+        )
+
+    def tail(units: List[_Unit]) -> List[_Unit]:
+        kept, total = [], 0
+        for unit in reversed(units):
+            if total + unit.tokens > overlap:
+                break
+            kept.insert(0, unit)
+            total += unit.tokens
+        # Never carry the whole chunk over, or nothing new would be added
+        return kept if len(kept) < len(units) else []
+
+    for block, is_heading, page in _blocks(pages):
+        if is_heading:
+            if config.split_on_headings:
+                if current:
+                    yield emit(current)
+                current, size = [], 0
+            # Headings are prepended to every chunk, so keep room for the body
+            heading = _fit(block, max(limit // 2, 1), count_tokens)
+            heading_tokens = count_tokens(heading) if config.prepend_heading else 0
+            if not config.split_on_headings and not config.prepend_heading:
+                # Keep the heading text itself searchable
+                current.append(_Unit(heading, count_tokens(heading), page, 0))
+                size += current[-1].tokens
+            continue
+
+        budget = max(limit - heading_tokens, 1)
+        for unit in _units(block, page, budget, count_tokens):
+            if current and (
+                size + unit.tokens > budget
+                or (
+                    config.respect_paragraphs
+                    and unit.paragraph_tokens
+                    and size + unit.paragraph_tokens > budget
+                    and size >= budget // 2
+                )
+            ):
+                yield emit(current)
+                current = tail(current)
+                size = sum(kept.tokens for kept in current)
+                while current and size + unit.tokens > budget:
+                    size -= current.pop(0).tokens
+            current.append(unit)
+            size += unit.tokens
+
+    if current:
+        yield emit(current)
+
+
+def _blocks(pages: Iterable[Page]) -> Iterator[Tuple[str, bool, Optional[int]]]:
+    """Yield (paragraph text, is heading, page) with wrapped lines rejoined."""
+    for page, text in pages:
+        lines: List[str] = []
+        previous = ""
+        stripped = [raw.strip() for raw in text.splitlines()]
+        for position, line in enumerate(stripped):
+            if not line:
+                if lines:
+                    yield _join(lines), False, page
+                    lines = []
+                previous = ""
+                continue
+            following = stripped[position + 1] if position + 1 < len(stripped) else ""
+            heading = _heading_text(line, previous, following)
+            if heading:
+                if lines:
+                    yield _join(lines), False, page
+                    lines = []
+                yield heading, True, page
+                previous = ""
+                continue
+            lines.append(line)
+            previous = line
+        if lines:
+            yield _join(lines), False, page
+
+
+def _heading_text(line: str, previous: str, following: str = "") -> Optional[str]:
+    match = _MARKDOWN_HEADING.match(line)
+    if match:
+        return match.group(1).strip()
+    # A short line after a paragraph break or a finished sentence, without
+    # sentence punctuation of its own, that is numbered or title/upper case.
+    if previous and not previous.endswith(_TERMINAL):
+        return None
+    if line.endswith(_TERMINAL) or len(line) > 80 or len(line.split()) > 10:
+        return None
+    if _NUMBERED_HEADING.match(line):
+        return line
+    # Title case alone is weak evidence (names, wrapped sentences): also need a
+    # blank line before it, or no lowercase continuation on the next line.
+    if previous and following[:1].islower():
+        return None
+    words = [word for word in line.split() if word[0].isalpha() and word not in _MINOR_WORDS]
+    if words and (line.isupper() or all(word[0].isupper() for word in words)) and len(line) >= 3:
+        return line
+    return None
+
+
+def _join(lines: List[str]) -> str:
+    text = lines[0]
+    for line in lines[1:]:
+        if text.endswith("-") and line[:1].islower():
+            text = text[:-1] + line  # rejoin a word hyphenated across lines
+        else:
+            text = f"{text} {line}"
+    return text
+
+
+def _units(paragraph: str, page: Optional[int], budget: int, count_tokens: TokenCounter) -> List[_Unit]:
+    units = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence)
+        if tokens <= budget:
+            units.append(_Unit(sentence, tokens, page, 0))
+        else:
+            units.extend(_split_long(sentence, page, budget, count_tokens))
+    if units:
+        units[0] = units[0]._replace(paragraph_tokens=sum(unit.tokens for unit in units))
+    return units
+
+
+def _split_long(sentence: str, page: Optional[int], budget: int, count_tokens: TokenCounter) -> List[_Unit]:
+    pieces, words, size = [], [], 0
+    for word in sentence.split():
+        tokens = count_tokens(word)
+        parts = [(word, tokens)] if tokens <= budget else _split_word(word, budget, count_tokens)
+        for part, tokens in parts:
+            if words and size + tokens > budget:
+                pieces.append(_Unit(" ".join(words), size, page, 0))
+                words, size = [], 0
+            words.append(part)
+            size += tokens
+    if words:
+        pieces.append(_Unit(" ".join(words), size, page, 0))
+    return pieces
+
+
+def _split_word(word: str, budget: int, count_tokens: TokenCounter) -> List[Tuple[str, int]]:
+    """Cut a run with no spaces into pieces of at most ``budget`` tokens each."""
+    parts = []
+    while word:
+        tokens = count_tokens(word)
+        if tokens <= budget:
+            parts.append((word, tokens))
+            break
+        end = max(1, len(word) * budget // tokens)
+        while end > 1 and count_tokens(word[:end]) > budget:
+            end = max(1, end * 9 // 10)
+        parts.append((word[:end], count_tokens(word[:end])))
+        word = word[end:]
+    return parts
+
+
+def _fit(text: str, budget: int, count_tokens: TokenCounter) -> str:
+    """The longest word-wise (or, for one long word, character-wise) prefix within ``budget``."""
+    if count_tokens(text) <= budget:
+        return text
+    pieces = _split_long(text, None, budget, count_tokens)
+    return pieces[0].text if pieces else ""
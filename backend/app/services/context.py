@@ -0,0 +1,130 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.services.chunking import TokenCounter
+from app.services.llm import per_model_setting
+from app.services.retrieval import RetrievedChunk
+from app.services.tokens import estimate_tokens, truncate_to_tokens
+
+# Shared text shorter than this is left alone; it is more likely a common
+# phrase than the overlap the chunker copied between neighbouring chunks.
+_MIN_OVERLAP_CHARS = 24
+# Chunks cut below this many tokens are more noise than context.
+_MIN_PIECE_TOKENS = 32
+
+
+class PackedContext(NamedTuple):
+    text: str
+    chunks: List[RetrievedChunk]  # the chunks used, best first, content as packed
+    tokens: int
+    dropped: int  # candidates left out as duplicates or for lack of budget
+
+
+def context_budget(model: Optional[str] = None) -> int:
+    """Context token budget for ``model``: its CONTEXT_TOKEN_BUDGETS entry or the default."""
+    budget = per_model_setting(settings.CONTEXT_TOKEN_BUDGETS, model or settings.LLM_MODEL)
+    return int(budget) if budget else settings.CONTEXT_TOKEN_BUDGET
+
+
+def pack_context(
+    chunks: List[RetrievedChunk],
+    budget: int,
+    count_tokens: TokenCounter = estimate_tokens,
+) -> PackedContext:
+    """Assemble prompt context from ``chunks`` (best first) within ``budget`` tokens.
+
+    Exact duplicates are dropped, and text a chunk shares with an already
+    chosen neighbour of the same document (the chunker's overlap) is cut from
+    it, so each passage is paid for once. Chunks are taken in score order
+    while they fit; the first that does not fit is truncated if enough room is
+    left. The chosen pieces are laid out by document, best document first, and
+    in reading order within it, with neighbouring chunks joined into one
+    passage.
+    """
+    chosen: Dict[Tuple[str, int], RetrievedChunk] = {}
+    seen = set()
+    used = dropped = 0
+
+    for chunk in chunks:
+        key = " ".join(chunk.content.split()).lower()
+        if key in seen:
+            dropped += 1
+            continue
+        seen.add(key)
+
+        # Chunks under a heading start with "<heading>\n" (CHUNK_PREPEND_HEADING);
+        # overlap is found between the bodies after a shared heading line.
+        content = chunk.content
+        previous = chosen.get((chunk.document_id, chunk.chunk_index - 1))
+        if previous is not None:
+            heading = _shared_heading(previous.content, content)
+            body = content[len(heading):]
+            content = heading + body[_overlap(previous.content[len(heading):], body):].lstrip()
+        following = chosen.get((chunk.document_id, chunk.chunk_index + 1))
+        if following is not None:
+            heading = _shared_heading(content, following.content)
+            cut = _overlap(content[len(heading):], following.content[len(heading):])
+            content = content[:len(content) - cut]
+        content = content.strip()
+        if not content or content == _heading(chunk.content).strip():
+            dropped += 1
+            continue
+
+        tokens = count_tokens(content)
+        if used + tokens > budget:
+            room = budget - used
+            if room < _MIN_PIECE_TOKENS:
+                dropped += 1
+                continue
+            content = truncate_to_tokens(content, room)
+            tokens = count_tokens(content)
+
+        chosen[(chunk.document_id, chunk.chunk_index)] = chunk.copy(update={"content": content})
+        used += tokens
+
+    document_rank: Dict[str, int] = {}
+    for chunk in chosen.values():
+        document_rank.setdefault(chunk.document_id, len(document_rank))
+    ordered = sorted(chosen.values(), key=lambda c: (document_rank[c.document_id], c.chunk_index))
+
+    passages: List[str] = []
+    for position, chunk in enumerate(ordered):
+        before = ordered[position - 1] if position else None
+        if before and before.document_id == chunk.document_id and before.chunk_index == chunk.chunk_index - 1:
+            # One passage under one heading: drop the repeated heading line
+            heading = _shared_heading(before.content, chunk.content)
+            passages[-1] = f"{passages[-1]} {chunk.content[len(heading):]}"
+        else:
+            passages.append(chunk.content)
+
+    return PackedContext(
+        text="\n\n".join(passages),
+        chunks=list(chosen.values()),
+        tokens=used,
+        dropped=dropped,
+    )
+
+
+def _heading(content: str) -> str:
+    """The leading "<heading>\n" line of a chunk, or "" (chunk bodies are single-line)."""
+    line, newline, _ = content.partition("\n")
+    return line + newline if newline else ""
+
+
+def _shared_heading(first: str, second: str) -> str:
+    heading = _heading(first)
+    return heading if heading and second.startswith(heading) else ""
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of ``first`` that starts ``second``."""
+    probe = second[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return 0
+    start = max(0, len(first) - len(second))
+    position = first.find(probe, start)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
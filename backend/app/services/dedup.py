@@ -0,0 +1,50 @@
+import hashlib
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.vector_codec import decode_vector
+from models import Document, DocumentChunk, Embedding
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    return content_hash(text.encode("utf-8"))
+
+
+def find_duplicate_document(db: Session, user_id: str, file_hash: str) -> Optional[Document]:
+    """Return the tenant's already-ingested document with identical file bytes, if any."""
+    return (
+        db.query(Document)
+        .filter(Document.user_id == user_id, Document.content_hash == file_hash)
+        .first()
+    )
+
+
+def find_reusable_embeddings(db: Session, user_id: str, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Map chunk hashes to vectors the tenant has already embedded for identical text.
+
+    Lookups stay within the tenant so no vector is shared across accounts.
+    """
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    rows = (
+        db.query(DocumentChunk.content_hash, Embedding.vector, Embedding.vector_blob)
+        .join(Embedding, Embedding.chunk_id == DocumentChunk.id)
+        .filter(Embedding.user_id == user_id, DocumentChunk.content_hash.in_(hashes))
+        .all()
+    )
+    vectors = {}
+    for row in rows:
+        if row.content_hash in vectors:
+            continue
+        if row.vector_blob is not None:
+            vectors[row.content_hash] = decode_vector(row.vector_blob).astype(np.float32)
+        elif row.vector is not None:
+            vectors[row.content_hash] = np.asarray(row.vector, dtype=np.float32)
+    return vectors
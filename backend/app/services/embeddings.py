@@ -0,0 +1,177 @@
+import asyncio
+import bisect
+import copy
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import settings
+from app.services import executors
+from app.services.query_cache import query_embedding_cache
+
+# Lower runs first: interactive queries jump ahead of bulk ingestion.
+PRIORITY_QUERY = 0
+PRIORITY_INGEST = 1
+
+_HISTOGRAM_BOUNDS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class _Request:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: "Future[np.ndarray]" = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent encode calls into batched forward passes.
+
+    A collector thread takes the first waiting request, then keeps gathering
+    for up to ``max_wait_ms`` or until ``max_batch_size`` texts, runs one
+    ``encode`` on the embed pool and hands each caller its own rows. At most
+    EMBED_POOL_SIZE batches run at once; requests arriving meanwhile are merged
+    into the next batch.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int, max_wait_ms: float):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._slots = threading.Semaphore(executors.POOL_SIZES["embed"])
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.queue_wait_seconds = 0.0
+        self.histogram = [0] * (len(_HISTOGRAM_BOUNDS) + 1)
+
+    def encode(self, texts: Sequence[str], priority: int = PRIORITY_INGEST) -> np.ndarray:
+        """Blocking encode for worker threads."""
+        return self._submit(texts, priority).result()
+
+    async def encode_async(self, texts: Sequence[str], priority: int = PRIORITY_QUERY) -> np.ndarray:
+        return await asyncio.wrap_future(self._submit(texts, priority))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            labels = [f"<={bound}" for bound in _HISTOGRAM_BOUNDS] + [f">{_HISTOGRAM_BOUNDS[-1]}"]
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "texts": self.texts,
+                "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "avg_queue_wait_ms": round(self.queue_wait_seconds * 1000 / self.requests, 3) if self.requests else 0.0,
+                "batch_size_histogram": dict(zip(labels, self.histogram)),
+                "queued": self._queue.qsize(),
+            }
+
+    def _submit(self, texts: Sequence[str], priority: int) -> "Future[np.ndarray]":
+        self._ensure_started()
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32))
+            return request.future
+        self._queue.put((priority, next(self._sequence), request))
+        return request.future
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> None:
+        while True:
+            # Wait for a free model slot first so arrivals pile up into the next batch.
+            self._slots.acquire()
+            _, _, first = self._queue.get()
+            batch = [first]
+            size = len(first.texts)
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                request = item[2]
+                if size + len(request.texts) > self.max_batch_size:
+                    # Too big for this batch; put it back for the next one.
+                    self._queue.put(item)
+                    break
+                batch.append(request)
+                size += len(request.texts)
+
+            future = executors.submit("embed", self._run, batch)
+            future.add_done_callback(lambda _: self._slots.release())
+
+    def _run(self, batch: List[_Request]) -> None:
+        started = time.perf_counter()
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = np.asarray(self._encode(texts), dtype=np.float32)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.queue_wait_seconds += sum(started - request.enqueued_at for request in batch)
+            self.histogram[bisect.bisect_left(_HISTOGRAM_BOUNDS, len(texts))] += 1
+
+
+embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+embedding_batcher = EmbeddingBatcher(
+    embedding_model.encode,
+    max_batch_size=settings.EMBED_MAX_BATCH_SIZE,
+    max_wait_ms=settings.EMBED_MAX_WAIT_MS,
+)
+
+
+_counting = threading.local()
+
+
+def count_model_tokens(text: str) -> int:
+    """Word pieces the embedding model sees for ``text``, excluding special tokens.
+
+    Each calling thread gets its own copy of the tokenizer: encode() on the
+    embed pool changes the shared fast tokenizer's truncation and padding
+    state, and using it concurrently raises "Already borrowed".
+    """
+    tokenizer = getattr(_counting, "tokenizer", None)
+    if tokenizer is None:
+        tokenizer = _counting.tokenizer = copy.deepcopy(embedding_model.tokenizer)
+    return len(tokenizer.tokenize(text))
+
+
+async def embed_query(text: str) -> np.ndarray:
+    """Embed a single query, reusing a cached vector for repeated questions."""
+    if query_embedding_cache is not None:
+        vector = query_embedding_cache.get(text)
+        if vector is not None:
+            return vector
+    vector = (await embedding_batcher.encode_async([text]))[0]
+    if query_embedding_cache is not None:
+        query_embedding_cache.put(text, vector)
+    return vector
@@ -0,0 +1,84 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Separate pools keep a burst of one kind of work (e.g. a 2,000 page upload)
+# from starving the others, and keep blocking calls off the event loop.
+# LLM calls need no pool: they go through the async client in app.services.llm.
+POOL_SIZES = {
+    "parse": settings.PARSE_POOL_SIZE,
+    "chunk": settings.CHUNK_POOL_SIZE,
+    "embed": settings.EMBED_POOL_SIZE,
+    "search": settings.SEARCH_POOL_SIZE,
+    "rerank": settings.RERANK_POOL_SIZE,
+}
+
+_pools: Dict[str, Executor] = {}
+_pending: Dict[str, int] = {name: 0 for name in POOL_SIZES}
+_lock = threading.Lock()
+
+
+def get_pool(name: str) -> Executor:
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if name == "chunk" or (name == "parse" and settings.PARSE_POOL_KIND == "process"):
+                # Spawn rather than fork: the parent runs threads and holds the model
+                pool = ProcessPoolExecutor(
+                    max_workers=POOL_SIZES[name], mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                pool = ThreadPoolExecutor(max_workers=POOL_SIZES[name], thread_name_prefix=f"{name}-pool")
+            _pools[name] = pool
+        return pool
+
+
+def submit(name: str, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+    """Submit work to a named pool, tracking how many calls are waiting or running."""
+    with _lock:
+        _pending[name] += 1
+    future = get_pool(name).submit(fn, *args, **kwargs)
+    future.add_done_callback(functools.partial(_finished, name))
+    return future
+
+
+def run_sync(name: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run ``fn`` on a named pool from a worker thread and wait for the result."""
+    return submit(name, fn, *args, **kwargs).result()
+
+
+async def run_in_pool(name: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run ``fn`` on a named pool without blocking the event loop."""
+    return await asyncio.wrap_future(submit(name, fn, *args, **kwargs))
+
+
+def pending(name: str) -> int:
+    with _lock:
+        return _pending[name]
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            name: {"size": size, "pending": _pending[name]}
+            for name, size in POOL_SIZES.items()
+        }
+
+
+def shutdown_pools() -> None:
+    with _lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+def _finished(name: str, _future: Future) -> None:
+    with _lock:
+        _pending[name] -= 1
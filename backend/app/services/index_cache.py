@@ -0,0 +1,285 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.services.index_tiers import index_nbytes
+
+# A loader returns a ready index for one tenant, the ids of its rows in order,
+# and whether the index is memory-mapped from disk. None means no vectors.
+IndexLoader = Callable[[], Optional[Tuple[faiss.Index, List[str], bool]]]
+# Returns a cheap summary of the tenant's stored rows (see tenant_fingerprint)
+VersionCheck = Callable[[], str]
+
+
+class _ReadWriteLock:
+    """Many concurrent readers (FAISS searches) or one writer (appends)."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            # Waiting writers go first so a stream of searches cannot starve an append
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class _IndexEntry:
+    """A built FAISS index plus the ids of the rows it holds, in insertion order."""
+
+    def __init__(self, index: faiss.Index, ids: List[str], mapped: bool = False, version: Optional[str] = None):
+        self.index = index
+        self.ids = ids
+        self.id_set = set(ids)
+        self.mapped = mapped
+        self.version = version  # tenant fingerprint the index is known to match
+        self.checked_at = time.monotonic()
+        self.lock = _ReadWriteLock()
+
+    @property
+    def nbytes(self) -> int:
+        # Ids are ~36 char UUID strings, held in the list and the set.
+        return index_nbytes(self.index) + len(self.ids) * 160
+
+
+class TenantIndexRegistry:
+    """Process-wide cache of per-tenant FAISS indexes, evicted by LRU and memory budget.
+
+    Other worker processes ingest and delete too, so when a ``version`` check
+    is passed, a cached index is compared with the database at most every
+    INDEX_CACHE_REVALIDATE_SECONDS and rebuilt if the tenant's rows changed.
+    """
+
+    def __init__(self, max_tenants: int, max_bytes: int):
+        self.max_tenants = max_tenants
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _IndexEntry]" = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.evictions = 0
+        self.revalidation_rebuilds = 0
+        self.build_seconds = 0.0
+
+    def search(
+        self,
+        user_id: str,
+        query_vectors: np.ndarray,
+        k: int,
+        loader: IndexLoader,
+        version: Optional[VersionCheck] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return (id, distance) pairs for the k nearest rows of the tenant's index."""
+        entry = self._get_or_build(user_id, loader, version)
+        if entry is None:
+            return []
+        # FAISS searches are thread-safe; only appends need the index to themselves
+        with entry.lock.read():
+            distances, positions = entry.index.search(
+                np.ascontiguousarray(query_vectors, dtype=np.float32), min(k, entry.index.ntotal)
+            )
+            ids = entry.ids
+        return [
+            (ids[pos], float(dist))
+            for pos, dist in zip(positions[0], distances[0])
+            if pos != -1
+        ]
+
+    def add(self, user_id: str, ids: List[str], vectors: np.ndarray) -> None:
+        """Append freshly stored vectors to a cached index, if the tenant has one."""
+        if not ids:
+            return
+        with self._lock:
+            # Any build still in flight may have read the table before these rows
+            # were committed, so it must not be cached.
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        with entry.lock.write():
+            # A build that started after the ingest commit already holds these rows
+            fresh = [row for row, chunk_id in enumerate(ids) if chunk_id not in entry.id_set]
+            if not fresh:
+                return
+            if len(fresh) < len(ids):
+                ids = [ids[row] for row in fresh]
+                vectors = np.asarray(vectors)[fresh]
+            if entry.mapped:
+                # Never write through a file mapping; take a private copy first.
+                entry.index = faiss.clone_index(entry.index)
+                entry.mapped = False
+            entry.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+            entry.ids.extend(ids)
+            entry.id_set.update(ids)
+        with self._lock:
+            self._evict()
+
+    def confirm(self, user_id: str, version: str, count: int) -> bool:
+        """Record that the cached index matches ``version`` if it holds ``count`` rows.
+
+        False when the tenant is not cached or the count differs, e.g. because
+        another job has committed rows it has not published yet.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+        with entry.lock.read():
+            if entry.index.ntotal != count:
+                return False
+            entry.version = version
+            entry.checked_at = time.monotonic()
+        return True
+
+    def cached_index(self, user_id: str) -> Optional[faiss.Index]:
+        """The tenant's cached index, without counting a lookup or building one."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        return entry.index if entry is not None else None
+
+    def warm(self, user_id: str, loader: IndexLoader, version: Optional[VersionCheck] = None) -> None:
+        """Build (or load) a tenant's index now instead of on its next search."""
+        self._get_or_build(user_id, loader, version)
+
+    def persist(self, user_id: str, writer: Callable[[faiss.Index, List[str]], None]) -> bool:
+        """Call ``writer`` with a consistent view of a cached index; False if not cached."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+        with entry.lock.read():
+            writer(entry.index, entry.ids)
+        return True
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a tenant's index so it is rebuilt on the next search."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tenants": len(self._entries),
+                "mapped": sum(1 for entry in self._entries.values() if entry.mapped),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "builds": self.builds,
+                "evictions": self.evictions,
+                "revalidation_rebuilds": self.revalidation_rebuilds,
+                "build_seconds_total": round(self.build_seconds, 4),
+                "build_seconds_avg": round(self.build_seconds / self.builds, 4) if self.builds else 0.0,
+            }
+
+    def _get_or_build(
+        self, user_id: str, loader: IndexLoader, version: Optional[VersionCheck] = None
+    ) -> Optional[_IndexEntry]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and version is not None and self._stale(entry, version):
+            with self._lock:
+                if self._entries.get(user_id) is entry:
+                    self._generations[user_id] = self._generations.get(user_id, 0) + 1
+                    self._entries.pop(user_id)
+                    self.revalidation_rebuilds += 1
+            entry = None
+
+        with self._lock:
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            build_lock = self._build_locks.setdefault(user_id, threading.Lock())
+
+        # Only one request per tenant builds; the others wait and reuse its result.
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    self._entries.move_to_end(user_id)
+                    return entry
+                generation = self._generations.get(user_id, 0)
+
+            start = time.perf_counter()
+            # Taken before reading rows: a commit in between only makes the next check rebuild
+            current = version() if version is not None else None
+            loaded = loader()
+            if loaded is None:
+                return None
+            index, ids, mapped = loaded
+            entry = _IndexEntry(index, list(ids), mapped, current)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.builds += 1
+                self.build_seconds += elapsed
+                if self._generations.get(user_id, 0) == generation:
+                    self._entries[user_id] = entry
+                    self._evict()
+        return entry
+
+    def _stale(self, entry: _IndexEntry, version: VersionCheck) -> bool:
+        now = time.monotonic()
+        if now - entry.checked_at < settings.INDEX_CACHE_REVALIDATE_SECONDS:
+            return False
+        current = version()
+        if current != entry.version:
+            return True
+        entry.checked_at = now
+        return False
+
+    def _evict(self) -> None:
+        """Evict least recently used tenants until both limits hold. Caller holds the lock."""
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_tenants or total > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+            self.evictions += 1
+
+
+index_registry = TenantIndexRegistry(
+    max_tenants=settings.INDEX_CACHE_MAX_TENANTS,
+    max_bytes=settings.INDEX_CACHE_MAX_BYTES,
+)
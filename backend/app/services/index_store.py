@@ -0,0 +1,119 @@
+import json
+import os
+import re
+import shutil
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.index_tiers import TIER_FLAT
+from database import SessionLocal
+from models import Embedding
+
+# Bump whenever the on-disk layout changes so old shards are rebuilt, not misread.
+SHARD_FORMAT_VERSION = 2
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def tenant_fingerprint(db: Session, user_id: str) -> str:
+    """Summarise a tenant's stored embeddings so a shard can be checked for staleness."""
+    count, latest = (
+        db.query(func.count(Embedding.id), func.max(Embedding.created_at))
+        .filter(Embedding.user_id == user_id)
+        .one()
+    )
+    return f"{count}:{latest.isoformat() if latest else ''}"
+
+
+def current_fingerprint(user_id: str) -> str:
+    """tenant_fingerprint on a session of the calling thread."""
+    db = SessionLocal()
+    try:
+        return tenant_fingerprint(db, user_id)
+    finally:
+        db.close()
+
+
+def fingerprint_count(fingerprint: str) -> int:
+    return int(fingerprint.split(":", 1)[0])
+
+
+class IndexShardStore:
+    """Per-tenant FAISS index shards on local disk; flat indexes are memory-mapped.
+
+    Each tenant gets a directory holding ``index.faiss``, ``ids.npy`` (row
+    position -> chunk id) and ``meta.json``. The metadata is written last and
+    records the format version, index kind and the tenant fingerprint at write
+    time; any mismatch on load means the shard is stale and must be rebuilt.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def load(self, user_id: str, fingerprint: str, index_kind: str) -> Optional[Tuple[faiss.Index, List[str], bool]]:
+        """Return (index, ids, memory-mapped) for a current shard of ``index_kind``, else None."""
+        directory = self._directory(user_id)
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            if (
+                meta.get("format_version") != SHARD_FORMAT_VERSION
+                or meta.get("index_kind") != index_kind
+                or meta.get("fingerprint") != fingerprint
+            ):
+                return None
+            # Graph and inverted-list indexes are read into memory: only flat
+            # storage is safe to map and later clone for appends.
+            mapped = index_kind.split(":")[0] == TIER_FLAT
+            flags = faiss.IO_FLAG_MMAP if mapped else 0
+            index = faiss.read_index(os.path.join(directory, "index.faiss"), flags)
+            ids = np.load(os.path.join(directory, "ids.npy"), allow_pickle=False).tolist()
+        except (OSError, ValueError, RuntimeError):
+            return None
+
+        # Files are replaced one at a time, so guard against a half-updated shard.
+        if index.ntotal != meta.get("count") or len(ids) != index.ntotal:
+            return None
+        return index, ids, mapped
+
+    def save(self, user_id: str, index: faiss.Index, ids: List[str], fingerprint: str, index_kind: str) -> None:
+        directory = self._directory(user_id)
+        os.makedirs(directory, exist_ok=True)
+        suffix = f".{os.getpid()}.tmp"
+
+        index_path = os.path.join(directory, "index.faiss")
+        faiss.write_index(index, index_path + suffix)
+        os.replace(index_path + suffix, index_path)
+
+        ids_path = os.path.join(directory, "ids.npy")
+        with open(ids_path + suffix, "wb") as f:
+            np.save(f, np.array(ids, dtype=str), allow_pickle=False)
+        os.replace(ids_path + suffix, ids_path)
+
+        meta_path = os.path.join(directory, "meta.json")
+        with open(meta_path + suffix, "w") as f:
+            json.dump({
+                "format_version": SHARD_FORMAT_VERSION,
+                "index_kind": index_kind,
+                "dimension": index.d,
+                "count": index.ntotal,
+                "fingerprint": fingerprint,
+            }, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    def delete(self, user_id: str) -> None:
+        shutil.rmtree(self._directory(user_id), ignore_errors=True)
+
+    def _directory(self, user_id: str) -> str:
+        if not _SAFE_ID.match(user_id):
+            raise ValueError(f"Unsafe tenant id for shard path: {user_id!r}")
+        return os.path.join(self.root, user_id)
+
+
+shard_store = IndexShardStore(settings.INDEX_SHARD_DIR) if settings.INDEX_SHARDS_ENABLED else None
@@ -0,0 +1,123 @@
+import math
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_codec import uses_cosine
+
+# Index kinds, from exact to most compressed. The kind is also recorded in
+# on-disk shards, so a shard built for another tier is never reused.
+TIER_FLAT = "flat"
+TIER_HNSW = "hnsw"
+TIER_IVF_FLAT = "ivf-flat"
+TIER_IVF_PQ = "ivf-pq"
+TIERS = (TIER_FLAT, TIER_HNSW, TIER_IVF_FLAT, TIER_IVF_PQ)
+
+
+def shard_kind(tier: str) -> str:
+    """Key stored with a persisted index: its tier plus the metric it was built for."""
+    return f"{tier}:{settings.SIMILARITY_METRIC}"
+
+
+def choose_tier(count: int) -> str:
+    """Pick the index kind for a tenant holding ``count`` vectors.
+
+    Exact search below INDEX_TIER_APPROX_MIN vectors, INDEX_TIER_MEDIUM_KIND
+    (HNSW or IVF-Flat) up to INDEX_TIER_PQ_MIN, and compressed IVF-PQ above.
+    """
+    if count < settings.INDEX_TIER_APPROX_MIN:
+        return TIER_FLAT
+    if count < settings.INDEX_TIER_PQ_MIN:
+        return settings.INDEX_TIER_MEDIUM_KIND
+    return TIER_IVF_PQ
+
+
+def build_index(vectors: np.ndarray, tier: str) -> faiss.Index:
+    """Build an index of kind ``tier`` over ``vectors``, training it first if needed.
+
+    In cosine mode the index ranks by inner product, so ``vectors`` must
+    already be unit length.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    metric = faiss.METRIC_INNER_PRODUCT if uses_cosine() else faiss.METRIC_L2
+
+    if tier == TIER_FLAT:
+        index = faiss.IndexFlat(dimension, metric)
+    elif tier == TIER_HNSW:
+        index = faiss.IndexHNSWFlat(dimension, settings.FAISS_HNSW_M, metric)
+        index.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+    elif tier in (TIER_IVF_FLAT, TIER_IVF_PQ):
+        nlist = _nlist(count)
+        quantizer = faiss.IndexFlat(dimension, metric)
+        if tier == TIER_IVF_FLAT:
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_m(dimension), 8, metric)
+        index.own_fields = True
+        quantizer.this.disown()
+        index.train(_training_sample(vectors, nlist))
+    else:
+        raise ValueError(f"Unknown index tier: {tier!r}")
+
+    index.add(vectors)
+    configure_search(index)
+    return index
+
+
+def configure_search(index: faiss.Index) -> faiss.Index:
+    """Apply the query-time knobs, which are not kept when an index is saved."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings.FAISS_HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(settings.FAISS_IVF_NPROBE, index.nlist)
+    return index
+
+
+def index_tier(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return TIER_HNSW
+    if isinstance(index, faiss.IndexIVFPQ):
+        return TIER_IVF_PQ
+    if isinstance(index, faiss.IndexIVF):
+        return TIER_IVF_FLAT
+    return TIER_FLAT
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """Approximate resident size of an index, for the cache memory budget."""
+    count, dimension = index.ntotal, index.d
+    if isinstance(index, faiss.IndexHNSW):
+        # Full vectors plus about two links per neighbour slot on the base layer
+        return count * (dimension * 4 + settings.FAISS_HNSW_M * 2 * 4)
+    if isinstance(index, faiss.IndexIVF):
+        centroids = index.nlist * dimension * 4
+        return centroids + count * (index.code_size + 8)
+    return count * dimension * 4
+
+
+def _nlist(count: int) -> int:
+    if settings.FAISS_IVF_NLIST > 0:
+        nlist = settings.FAISS_IVF_NLIST
+    else:
+        nlist = int(4 * math.sqrt(count))
+    # k-means wants a few dozen points per centroid
+    return max(1, min(nlist, count // 39))
+
+
+def _pq_m(dimension: int) -> int:
+    """Largest sub-quantizer count no greater than FAISS_PQ_M that divides ``dimension``."""
+    m = min(settings.FAISS_PQ_M, dimension)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def _training_sample(vectors: np.ndarray, nlist: int) -> np.ndarray:
+    """Existing embeddings used to train the coarse quantizer (and PQ codebooks)."""
+    size = min(len(vectors), max(settings.FAISS_TRAIN_SAMPLE, nlist * 39))
+    if size == len(vectors):
+        return vectors
+    rows = np.random.default_rng(0).choice(len(vectors), size=size, replace=False)
+    return vectors[np.sort(rows)]
@@ -0,0 +1,140 @@
+import asyncio
+import enum
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class IngestionJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    batch_id: Optional[str] = None  # shared by the files of one multi-file upload
+    filename: str
+    filepath: str
+    content_hash: Optional[str] = None
+    status: JobStatus = JobStatus.QUEUED
+    document_id: Optional[str] = None
+    pages_total: Optional[int] = None
+    pages_parsed: int = 0
+    chunks_total: Optional[int] = None
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def public_dict(self) -> dict:
+        return self.dict(exclude={"filepath"})
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# Handlers are plain blocking functions so the same code can later run under an
+# external worker (Celery, RQ, ...) that only needs the job fields.
+JobHandler = Callable[[IngestionJob], None]
+
+
+class InProcessIngestionQueue:
+    """Bounded asyncio queue drained by a fixed number of worker tasks.
+
+    Jobs are kept in memory for status polling; the oldest finished jobs are
+    forgotten once ``retention`` is exceeded.
+    """
+
+    def __init__(self, max_queue_size: int, concurrency: int, retention: int):
+        self.max_queue_size = max_queue_size
+        self.concurrency = concurrency
+        self.retention = retention
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._handler: Optional[JobHandler] = None
+
+    def start(self, handler: JobHandler) -> None:
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, job: IngestionJob) -> IngestionJob:
+        if self._queue is None:
+            raise RuntimeError("Ingestion queue has not been started")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError("Ingestion queue is full")
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def batch(self, batch_id: str) -> List[IngestionJob]:
+        with self._jobs_lock:
+            return [job for job in self._jobs.values() if job.batch_id == batch_id]
+
+    def stats(self) -> dict:
+        with self._jobs_lock:
+            running = sum(1 for job in self._jobs.values() if job.status == JobStatus.RUNNING)
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": running,
+            "max_queue_size": self.max_queue_size,
+            "concurrency": self.concurrency,
+        }
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = JobStatus.RUNNING
+            job.started_at = datetime.utcnow()
+            try:
+                await asyncio.to_thread(self._handler, job)
+                job.status = JobStatus.COMPLETED
+            except Exception as e:
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+                print(f"Ingestion job {job.id} failed: {str(e)}")
+            finally:
+                job.finished_at = datetime.utcnow()
+                self._queue.task_done()
+
+    def _trim(self) -> None:
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+        ]
+        for job_id in finished[:max(len(self._jobs) - self.retention, 0)]:
+            del self._jobs[job_id]
+
+
+ingestion_queue = InProcessIngestionQueue(
+    max_queue_size=settings.INGEST_QUEUE_SIZE,
+    concurrency=settings.INGEST_CONCURRENCY,
+    retention=settings.INGEST_JOB_RETENTION,
+)
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMQueueFullError(LLMError):
+    """Too many requests are already waiting for this model."""
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class _ModelLimiter:
+    """Caps in-flight generations for one model and bounds how many may wait."""
+
+    def __init__(self, max_in_flight: int, max_queue: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.queue_wait_seconds = 0.0
+        self.generation_seconds = 0.0
+        self.first_token_seconds = 0.0
+
+    async def acquire(self) -> float:
+        """Wait for a slot and return how long that took."""
+        if self.in_flight + self.waiting >= self.max_in_flight + self.max_queue:
+            self.rejected += 1
+            raise LLMQueueFullError("LLM queue is full")
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=settings.LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError("Timed out waiting for an LLM slot")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        waited = time.perf_counter() - start
+        self.queue_wait_seconds += waited
+        return waited
+
+    @property
+    def load(self) -> int:
+        return self.in_flight + self.waiting
+
+    @property
+    def saturated(self) -> bool:
+        """No free slot and at least LLM_FALLBACK_QUEUE_DEPTH requests already waiting."""
+        return self.in_flight >= self.max_in_flight and (
+            self.waiting >= settings.LLM_FALLBACK_QUEUE_DEPTH
+            or self.load >= self.max_in_flight + self.max_queue
+        )
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def stats(self) -> dict:
+        def avg(total: float) -> float:
+            return round(total / self.requests, 4) if self.requests else 0.0
+
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "avg_queue_wait_seconds": avg(self.queue_wait_seconds),
+            "avg_time_to_first_token_seconds": avg(self.first_token_seconds),
+            "avg_generation_seconds": avg(self.generation_seconds),
+        }
+
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+# Keyed by (Ollama base URL, model): each replica runs its own generations
+_limiters: Dict[Tuple[str, str], _ModelLimiter] = {}
+
+
+def endpoints() -> List[str]:
+    """Base URLs of the Ollama replicas, from OLLAMA_BASE_URLS or OLLAMA_BASE_URL."""
+    urls = [url.strip().rstrip("/") for url in settings.OLLAMA_BASE_URLS.split(",") if url.strip()]
+    return urls or [settings.OLLAMA_BASE_URL.rstrip("/")]
+
+
+def per_model_setting(mapping: str, key: str) -> Optional[str]:
+    """Look ``key`` up in a "name=value,name=value" setting."""
+    for entry in mapping.split(","):
+        name, _, value = entry.strip().partition("=")
+        if name == key and value:
+            return value
+    return None
+
+
+def get_client(base_url: Optional[str] = None) -> httpx.AsyncClient:
+    """Shared client per replica so connections to Ollama are pooled and kept alive."""
+    base_url = base_url or endpoints()[0]
+    client = _clients.get(base_url)
+    if client is None:
+        client = _clients[base_url] = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+            ),
+            # The read timeout bounds the gap between streamed tokens, not the whole answer.
+            timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+        )
+    return client
+
+
+async def close_client() -> None:
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+def get_limiter(model: str, base_url: Optional[str] = None) -> _ModelLimiter:
+    key = (base_url or endpoints()[0], model)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = _limiters[key] = _ModelLimiter(
+            settings.LLM_MAX_IN_FLIGHT_PER_MODEL, settings.LLM_MAX_QUEUE_PER_MODEL
+        )
+    return limiter
+
+
+def endpoint_load(base_url: str) -> int:
+    """Generations running or waiting on a replica, across all models."""
+    return sum(limiter.load for (url, _), limiter in _limiters.items() if url == base_url)
+
+
+def least_loaded(model: str) -> str:
+    """The replica with the fewest requests for ``model``, then the fewest overall."""
+    return min(endpoints(), key=lambda url: (get_limiter(model, url).load, endpoint_load(url)))
+
+
+def stats() -> dict:
+    result: Dict[str, dict] = {}
+    for (url, model), limiter in _limiters.items():
+        result.setdefault(url, {})[model] = limiter.stats()
+    return result
+
+
+async def stream_generate(
+    prompt: str, model: Optional[str] = None, base_url: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Yield response tokens from Ollama's /api/generate as they are produced.
+
+    Runs on ``base_url``, or the least-loaded replica for the model. Waits
+    for a free slot for the model there first, raising LLMQueueFullError when
+    too many requests are already queued. Closing the generator early (e.g.
+    the HTTP client went away) closes the upstream connection, which makes
+    Ollama abort the generation.
+    """
+    model = model or settings.LLM_MODEL
+    base_url = base_url or least_loaded(model)
+    limiter = get_limiter(model, base_url)
+    await limiter.acquire()
+    limiter.requests += 1
+    start = time.perf_counter()
+    first_token = True
+    payload = {"model": model, "prompt": prompt, "stream": True}
+    try:
+        async with get_client(base_url).stream("POST", "/api/generate", json=payload) as response:
+            if response.status_code != 200:
+                limiter.errors += 1
+                raise LLMError(f"Ollama returned HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if time.perf_counter() - start > settings.LLM_GENERATION_TIMEOUT:
+                    raise LLMTimeoutError("LLM generation timed out")
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if data.get("error"):
+                    raise LLMError(data["error"])
+                if data.get("response"):
+                    if first_token:
+                        limiter.first_token_seconds += time.perf_counter() - start
+                        first_token = False
+                    yield data["response"]
+                if data.get("done"):
+                    break
+    except httpx.TimeoutException as e:
+        limiter.timeouts += 1
+        raise LLMTimeoutError(str(e)) from e
+    except httpx.HTTPError as e:
+        limiter.errors += 1
+        raise LLMError(str(e)) from e
+    finally:
+        limiter.generation_seconds += time.perf_counter() - start
+        limiter.release()
+
+
+async def generate(prompt: str, model: Optional[str] = None, base_url: Optional[str] = None) -> str:
+    """Collect a full answer from the token stream."""
+    return "".join([token async for token in stream_generate(prompt, model, base_url)])
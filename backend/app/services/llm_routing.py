@@ -0,0 +1,76 @@
+import threading
+from collections import Counter
+from typing import List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.services import llm
+from app.services.context import context_budget
+from models import PlanType
+
+
+class LLMRoute(NamedTuple):
+    model: str
+    base_url: str
+    fallback: bool  # not the first model the plan would use
+
+
+_lock = threading.Lock()
+_routes: Counter = Counter()
+
+
+def plan_models(plan: Optional[PlanType]) -> List[str]:
+    """Models a plan may use, preferred first, ending with LLM_FALLBACK_MODEL."""
+    chain = llm.per_model_setting(settings.LLM_PLAN_MODELS, plan.value if plan else "")
+    models = [model.strip() for model in (chain or settings.LLM_MODEL).split("|") if model.strip()]
+    if settings.LLM_FALLBACK_MODEL and settings.LLM_FALLBACK_MODEL not in models:
+        models.append(settings.LLM_FALLBACK_MODEL)
+    return models
+
+
+def context_window(model: str) -> Optional[int]:
+    window = llm.per_model_setting(settings.LLM_MODEL_CONTEXT_TOKENS, model)
+    return int(window) if window else None
+
+
+def choose_route(plan: Optional[PlanType], base_tokens: int, context_tokens: int) -> LLMRoute:
+    """Pick the model and Ollama replica for one prompt.
+
+    ``base_tokens`` is the prompt without document context and
+    ``context_tokens`` the context on offer, which is packed down to each
+    model's context budget. Models whose window cannot hold the prompt are
+    skipped (the largest window is used if none can). The first remaining
+    model in the plan's order whose least-loaded replica is not saturated
+    wins; when all are saturated the request queues for the first one.
+    """
+    models = plan_models(plan)
+
+    def prompt_tokens(model: str) -> int:
+        return base_tokens + min(context_tokens, context_budget(model))
+
+    fitting = [
+        model for model in models
+        if context_window(model) is None or prompt_tokens(model) <= context_window(model)
+    ]
+    if not fitting:
+        fitting = [max(models, key=lambda model: context_window(model) or 0)]
+
+    route = None
+    for model in fitting:
+        base_url = llm.least_loaded(model)
+        if not llm.get_limiter(model, base_url).saturated:
+            route = LLMRoute(model, base_url, model != models[0])
+            break
+    if route is None:
+        route = LLMRoute(fitting[0], llm.least_loaded(fitting[0]), fitting[0] != models[0])
+
+    with _lock:
+        _routes[(plan.value if plan else None, route.model, route.fallback)] += 1
+    return route
+
+
+def stats() -> list:
+    with _lock:
+        return [
+            {"plan": plan, "model": model, "fallback": fallback, "requests": count}
+            for (plan, model, fallback), count in sorted(_routes.items(), key=str)
+        ]
@@ -0,0 +1,66 @@
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from docx import Document  # for DOC files
+
+from app.core.config import settings
+from app.services.chunking import ChunkingConfig, TextChunk, chunk_pages
+
+# These run on the parse pool, which may be a process pool, so they take and
+# return only plain picklable values.
+
+
+def count_pdf_pages(filepath: str) -> int:
+    with fitz.open(filepath) as doc:
+        return len(doc)
+
+
+def extract_pdf_page_range(filepath: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages ``start`` to ``stop - 1``."""
+    with fitz.open(filepath) as doc:
+        return [doc[number].get_text() for number in range(start, min(stop, len(doc)))]
+
+
+def extract_text_from_doc(filepath: str) -> str:
+    """Paragraph text separated by blank lines; Word headings are marked up as Markdown
+    headings so the chunker can split sections on them."""
+    doc = Document(filepath)
+    lines = []
+    for paragraph in doc.paragraphs:
+        style = paragraph.style.name if paragraph.style is not None else ""
+        level = style[len("Heading "):] if style.startswith("Heading ") else ""
+        if level.isdigit() and paragraph.text.strip():
+            lines.append(f"{'#' * min(int(level), 6)} {paragraph.text.strip()}")
+        else:
+            lines.append(paragraph.text)
+    return "\n\n".join(lines)
+
+
+def parse_and_chunk(filepath: str, config: dict) -> Tuple[Optional[int], List[TextChunk]]:
+    """Extract and chunk a whole file in one call; returns (page count, chunks).
+
+    Meant for the chunk process pool, so several files are parsed and chunked
+    on separate cores. Page count is None for Word documents.
+    """
+    if filepath.lower().endswith(".pdf"):
+        with fitz.open(filepath) as doc:
+            page_count = len(doc)
+            pages = ((number + 1, doc[number].get_text()) for number in range(page_count))
+            chunks = list(chunk_pages(pages, ChunkingConfig(**config), _count_tokens))
+        return page_count, chunks
+    pages = [(None, extract_text_from_doc(filepath))]
+    return None, list(chunk_pages(pages, ChunkingConfig(**config), _count_tokens))
+
+
+_tokenizer = None
+
+
+def _count_tokens(text: str) -> int:
+    # Worker processes load only the embedding model's tokenizer, not the model.
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+
+        name = settings.EMBEDDING_MODEL
+        _tokenizer = AutoTokenizer.from_pretrained(name if "/" in name else f"sentence-transformers/{name}")
+    return len(_tokenizer.tokenize(text))
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_codec import decode_vector, encode_vector
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Fold case, Unicode forms, whitespace and trailing punctuation so trivially
+    different spellings of a question share one cache entry."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip("?!. ")
+
+
+def _cache_key(text: str, model: str) -> str:
+    return hashlib.sha1(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query vectors keyed by model name and normalized text.
+
+    With ``shared_path`` set, entries are also written to a SQLite file that
+    every uvicorn worker on the host reads, so a question embedded by one worker
+    is a hit in all of them. The in-memory LRU stays in front as a first level.
+    """
+
+    def __init__(self, model: str, max_entries: int, ttl_seconds: float, shared_path: Optional[str] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_path = shared_path
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shared_writes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        if shared_path:
+            self._connect().execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                " key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = _cache_key(text, self.model)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+
+        vector = self._get_shared(key, now) if self.shared_path else None
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._remember(key, vector, now)
+        return vector
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        key = _cache_key(text, self.model)
+        now = time.time()
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector, now)
+        if self.shared_path:
+            self._put_shared(key, vector, now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "shared": bool(self.shared_path),
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, vector: np.ndarray, created_at: float) -> None:
+        self._entries[key] = (vector, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.shared_path)), exist_ok=True)
+            connection = sqlite3.connect(self.shared_path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _get_shared(self, key: str, now: float) -> Optional[np.ndarray]:
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                return None
+            connection.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (now, key))
+            # Copy so the array does not pin the SQLite row buffer.
+            return decode_vector(row[0]).copy()
+        except sqlite3.Error as e:
+            print(f"Warning: shared query cache read failed: {str(e)}")
+            return None
+
+    def _put_shared(self, key: str, vector: np.ndarray, now: float) -> None:
+        try:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, encode_vector(vector, "float32"), now, now),
+            )
+            self._shared_writes += 1
+            # Trimming scans the table, so only do it every few hundred writes.
+            if self._shared_writes % 256 == 0:
+                connection.execute(
+                    "DELETE FROM query_embeddings WHERE key NOT IN "
+                    "(SELECT key FROM query_embeddings ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            print(f"Warning: shared query cache write failed: {str(e)}")
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    model=settings.EMBEDDING_MODEL,
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+    shared_path=settings.QUERY_CACHE_PATH if settings.QUERY_CACHE_BACKEND == "shared" else None,
+) if settings.QUERY_CACHE_ENABLED else None
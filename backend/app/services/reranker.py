@@ -0,0 +1,108 @@
+import threading
+import time
+from typing import Dict, List, Sequence
+
+from app.core.config import settings
+from app.services import executors
+from app.services.retrieval import RetrievedChunk, timed
+
+
+class CrossEncoderReranker:
+    """Rescore retrieved candidates with a small cross-encoder on the rerank pool.
+
+    The model reads each (question, chunk) pair together, which ranks far
+    better than comparing two independently computed embeddings, at the cost
+    of one forward pass per candidate. Candidates are scored in batches, best
+    retrieved first; once ``time_budget_ms`` has passed no further batch is
+    started and the unscored tail keeps its retrieval order. When
+    ``max_pending`` rerank calls are already waiting or running, reranking is
+    skipped altogether so load spikes do not add latency.
+
+    ``score`` keeps the retrieval score; the cross-encoder's goes into
+    ``rerank_score``, which stays None for candidates it did not get to.
+    """
+
+    def __init__(self, model_name: str, batch_size: int, time_budget_ms: float, max_pending: int):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.time_budget = time_budget_ms / 1000
+        self.max_pending = max_pending
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reranked = 0
+        self.skipped_under_load = 0
+        self.over_budget = 0
+
+    async def rerank(
+        self, query: str, chunks: List[RetrievedChunk], k: int, timings: Dict[str, float]
+    ) -> List[RetrievedChunk]:
+        """Return the best ``k`` of ``chunks`` by cross-encoder score."""
+        if len(chunks) <= 1:
+            return chunks[:k]
+        if executors.pending("rerank") >= self.max_pending:
+            with self._stats_lock:
+                self.skipped_under_load += 1
+            return chunks[:k]
+
+        # The budget starts now, so time spent queued for the pool counts against it
+        deadline = time.perf_counter() + self.time_budget
+        with timed(timings, "rerank"):
+            scores = await executors.run_in_pool(
+                "rerank", self._score, query, [chunk.content for chunk in chunks], deadline
+            )
+
+        with self._stats_lock:
+            self.reranked += 1
+            if len(scores) < len(chunks):
+                self.over_budget += 1
+
+        scored = sorted(
+            (
+                chunk.copy(update={"rerank_score": min(max(float(score), 0.0), 1.0)})
+                for chunk, score in zip(chunks, scores)
+            ),
+            key=lambda chunk: chunk.rerank_score,
+            reverse=True,
+        )
+        return (scored + chunks[len(scores):])[:k]
+
+    async def warm(self) -> None:
+        """Load the model ahead of the first query, whose time budget would not cover it."""
+        await executors.run_in_pool("rerank", self._load)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "reranked": self.reranked,
+                "skipped_under_load": self.skipped_under_load,
+                "over_budget": self.over_budget,
+            }
+
+    def _score(self, query: str, texts: Sequence[str], deadline: float) -> List[float]:
+        model = self._load()
+        scores: List[float] = []
+        for start in range(0, len(texts), self.batch_size):
+            if time.perf_counter() >= deadline:
+                break
+            batch = [(query, text) for text in texts[start:start + self.batch_size]]
+            scores.extend(model.predict(batch, batch_size=self.batch_size, show_progress_bar=False).tolist())
+        return scores
+
+    def _load(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                # Single-label cross-encoders apply a sigmoid, so scores are 0..1.
+                self._model = CrossEncoder(self.model_name, device="cpu")
+            return self._model
+
+
+reranker = CrossEncoderReranker(
+    model_name=settings.RERANK_MODEL,
+    batch_size=settings.RERANK_BATCH_SIZE,
+    time_budget_ms=settings.RERANK_TIME_BUDGET_MS,
+    max_pending=settings.RERANK_MAX_PENDING,
+) if settings.RERANK_ENABLED else None
@@ -0,0 +1,237 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.vector_backends import vector_backend
+from database import SessionLocal
+from app.services.vector_codec import normalize_vectors, uses_cosine
+from models import TEXT_SEARCH_CONFIG, Document, DocumentChunk
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+
+class RetrievedChunk(BaseModel):
+    chunk_id: str
+    document_id: str
+    filename: str
+    chunk_index: int
+    content: str
+    score: float
+    rerank_score: Optional[float] = None  # cross-encoder relevance 0..1, when reranked
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+
+class StageLatency:
+    """Running per-stage latency totals for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List[float]] = {}  # stage -> [count, total seconds, max seconds]
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "avg_ms": round(total * 1000 / count, 3),
+                    "max_ms": round(slowest * 1000, 3),
+                }
+                for stage, (count, total, slowest) in self._stages.items()
+            }
+
+
+retrieval_latency = StageLatency()
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """Record how long the block took in ``timings`` (ms) and in retrieval_latency."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[stage] = round(elapsed * 1000, 3)
+        retrieval_latency.record(stage, elapsed)
+
+
+def vector_score(value: float) -> float:
+    """Map a vector backend result onto a 0..1 score where higher is more relevant.
+
+    Backends return cosine similarity in cosine mode (negative values mean
+    unrelated and clamp to 0) and squared L2 distance otherwise.
+    """
+    if uses_cosine():
+        return min(max(value, 0.0), 1.0)
+    return 1.0 / (1.0 + max(value, 0.0))
+
+
+def lexical_search(db: Session, user_id: str, query: str, k: int) -> List[Tuple[str, float]]:
+    """Full-text search over the tenant's chunks; returns (chunk id, rank) best first.
+
+    Query words are OR-ed so a chunk matching only an exact product code or
+    clause number still qualifies; ts_rank_cd favours chunks matching more of
+    them close together.
+    """
+    terms = list(dict.fromkeys(re.findall(r"\w+", query.lower())))
+    if not terms:
+        return []
+    # plainto_tsquery parses each word as plain text, so punctuation, "_" or a
+    # stopword can never produce invalid tsquery syntax; a stopword simply
+    # contributes an empty query to the OR.
+    tsquery = " || ".join(f"plainto_tsquery('{TEXT_SEARCH_CONFIG}', :term{i})" for i in range(len(terms)))
+    params = {f"term{i}": term for i, term in enumerate(terms)}
+    rows = db.execute(
+        text(
+            "SELECT c.id, ts_rank_cd(c.content_tsv, q.query) AS rank "
+            "FROM document_chunks c JOIN documents d ON d.id = c.document_id, "
+            f"(SELECT {tsquery}) AS q(query) "
+            "WHERE d.user_id = :user_id AND c.content_tsv @@ q.query "
+            "ORDER BY rank DESC LIMIT :k"
+        ),
+        {**params, "user_id": user_id, "k": k},
+    )
+    return [(row.id, float(row.rank)) for row in rows]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int, rrf_k: int) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists; scores are scaled so rank 1 in every list is 1.0."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    best = len(rankings) / (rrf_k + 1)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [(chunk_id, score / best) for chunk_id, score in fused]
+
+
+def search_chunks(
+    db: Session,
+    user_id: str,
+    query: str,
+    query_vector: np.ndarray,
+    k: int,
+    mode: str,
+    timings: Dict[str, float],
+) -> List[Tuple[str, float]]:
+    """Return (chunk id, 0..1 score) hits for ``mode`` (vector, lexical or hybrid).
+
+    Hybrid mode takes HYBRID_CANDIDATES from each retriever and fuses them with
+    reciprocal-rank fusion. Vector hits scoring under RETRIEVAL_MIN_SCORE are
+    dropped before fusion, so weak matches never reach the prompt. Each
+    stage's latency is added to ``timings``.
+    """
+    depth = max(k, settings.HYBRID_CANDIDATES) if mode == "hybrid" else k
+    vector_hits: List[Tuple[str, float]] = []
+    lexical_hits: List[Tuple[str, float]] = []
+    if mode in ("vector", "hybrid"):
+        if uses_cosine():
+            # A copy: the query vector may be shared with the query embedding cache
+            query_vector = normalize_vectors(query_vector)
+        with timed(timings, "vector_search"):
+            vector_hits = [
+                (chunk_id, score)
+                for chunk_id, score in (
+                    (chunk_id, vector_score(value))
+                    for chunk_id, value in vector_backend.search(db, user_id, query_vector, k=depth)
+                )
+                if score >= settings.RETRIEVAL_MIN_SCORE
+            ]
+    if mode in ("lexical", "hybrid"):
+        with timed(timings, "lexical_search"):
+            lexical_hits = lexical_search(db, user_id, query, depth)
+
+    if mode == "vector":
+        return vector_hits
+    if mode == "lexical":
+        # ts_rank_cd is unbounded; scale to the best hit
+        top = lexical_hits[0][1] if lexical_hits and lexical_hits[0][1] > 0 else 1.0
+        return [(chunk_id, rank / top) for chunk_id, rank in lexical_hits]
+    with timed(timings, "fusion"):
+        return reciprocal_rank_fusion(
+            [[chunk_id for chunk_id, _ in vector_hits], [chunk_id for chunk_id, _ in lexical_hits]],
+            k,
+            settings.RRF_K,
+        )
+
+
+def retrieve_chunks(
+    user_id: str,
+    query: str,
+    query_vector: np.ndarray,
+    k: int,
+    mode: str,
+    timings: Dict[str, float],
+) -> Tuple[List[Tuple[str, float]], List[RetrievedChunk]]:
+    """search_chunks then fetch_chunks, on a session owned by the calling thread.
+
+    Meant for the search pool: a cold FAISS cache or a stale shard means
+    reading, building and possibly training the tenant's index, which must
+    not run on the event loop.
+    """
+    db = SessionLocal()
+    try:
+        hits = search_chunks(db, user_id, query, query_vector, k, mode, timings)
+        with timed(timings, "fetch_chunks"):
+            chunks = fetch_chunks(db, hits)
+        return hits, chunks
+    finally:
+        db.close()
+
+
+def fetch_chunks(db: Session, hits: List[Tuple[str, float]]) -> List[RetrievedChunk]:
+    """Resolve (chunk id, score) hits to chunks and document metadata in one query.
+
+    Results keep the rank order of ``hits``; ids that no longer exist are dropped.
+    """
+    if not hits:
+        return []
+
+    rows = (
+        db.query(
+            DocumentChunk.id,
+            DocumentChunk.document_id,
+            DocumentChunk.chunk_index,
+            DocumentChunk.content,
+            DocumentChunk.page_start,
+            DocumentChunk.page_end,
+            Document.filename,
+        )
+        .join(Document, Document.id == DocumentChunk.document_id)
+        .filter(DocumentChunk.id.in_([chunk_id for chunk_id, _ in hits]))
+        .all()
+    )
+    by_id = {row.id: row for row in rows}
+
+    chunks = []
+    for chunk_id, score in hits:
+        row = by_id.get(chunk_id)
+        if row is None:
+            continue
+        chunks.append(RetrievedChunk(
+            chunk_id=row.id,
+            document_id=row.document_id,
+            filename=row.filename,
+            chunk_index=row.chunk_index,
+            content=row.content,
+            score=score,
+            page_start=row.page_start,
+            page_end=row.page_end,
+        ))
+    return chunks
@@ -0,0 +1,160 @@
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Deque, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services import executors
+from app.services.tokens import estimate_tokens, truncate_to_tokens
+from database import SessionLocal
+from models import ConversationTurn
+
+# (question, answer)
+Turn = Tuple[str, str]
+
+_FIRST_SENTENCE = re.compile(r"^(.+?[.!?])(\s|$)", re.S)
+
+
+class SessionStore:
+    """Recent conversation turns per session: an in-memory LRU in front of Postgres.
+
+    Only the last ``max_turns`` turns of a session are ever loaded, so prompt
+    assembly cost does not grow with conversation length.
+    """
+
+    def __init__(self, max_sessions: int, max_turns: int):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[Tuple[str, str], Deque[Turn]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached_turns(self, user_id: str, session_id: str) -> Optional[List[Turn]]:
+        """The session's turns if they are in memory, without touching the database."""
+        key = (user_id, session_id)
+        with self._lock:
+            turns = self._sessions.get(key)
+            if turns is None:
+                return None
+            self._sessions.move_to_end(key)
+            return list(turns)
+
+    def recent_turns(self, user_id: str, session_id: str, db: Optional[Session] = None) -> List[Turn]:
+        """Blocking: call from a worker pool. Opens its own DB session unless given one."""
+        turns = self.cached_turns(user_id, session_id)
+        if turns is not None:
+            return turns
+
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            rows = (
+                db.query(ConversationTurn.question, ConversationTurn.answer)
+                .filter(ConversationTurn.user_id == user_id, ConversationTurn.session_id == session_id)
+                .order_by(ConversationTurn.created_at.desc())
+                .limit(self.max_turns)
+                .all()
+            )
+        finally:
+            if own_session:
+                db.close()
+        turns = deque(((row.question, row.answer) for row in reversed(rows)), maxlen=self.max_turns)
+        with self._lock:
+            self._remember((user_id, session_id), turns)
+        return list(turns)
+
+    async def load(self, user_id: str, session_id: str) -> List[Turn]:
+        """Recent turns for a request handler: memory hits return at once, misses
+        are read on the search pool so the event loop never waits on Postgres."""
+        turns = self.cached_turns(user_id, session_id)
+        if turns is not None:
+            return turns
+        return await executors.run_in_pool("search", self.recent_turns, user_id, session_id)
+
+    def record(self, user_id: str, session_id: str, question: str, answer: str) -> "Future[None]":
+        """Record a finished turn without blocking the caller.
+
+        The in-memory copy is updated straight away so the next question in the
+        session sees it; the insert is committed on the search pool.
+        """
+        self._append_cached(user_id, session_id, question, answer)
+        future = executors.submit("search", self._insert, user_id, session_id, question, answer)
+        future.add_done_callback(_report_failed_insert)
+        return future
+
+    def append(self, user_id: str, session_id: str, question: str, answer: str) -> None:
+        """Blocking version of :meth:`record`."""
+        self._insert(user_id, session_id, question, answer)
+        self._append_cached(user_id, session_id, question, answer)
+
+    def _insert(self, user_id: str, session_id: str, question: str, answer: str) -> None:
+        # Uses its own DB session so it also works after a streamed response,
+        # when the request's session has already been closed.
+        db = SessionLocal()
+        try:
+            db.add(ConversationTurn(user_id=user_id, session_id=session_id, question=question, answer=answer))
+            db.commit()
+        finally:
+            db.close()
+
+    def _append_cached(self, user_id: str, session_id: str, question: str, answer: str) -> None:
+        key = (user_id, session_id)
+        with self._lock:
+            turns = self._sessions.get(key)
+            if turns is not None:
+                turns.append((question, answer))
+                self._sessions.move_to_end(key)
+
+    def _remember(self, key: Tuple[str, str], turns: Deque[Turn]) -> None:
+        self._sessions[key] = turns
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+def _report_failed_insert(future: "Future[None]") -> None:
+    error = future.exception()
+    if error is not None:
+        print(f"Failed to save conversation turn: {str(error)}")
+
+
+def build_history_text(turns: List[Turn], budget: int) -> str:
+    """Fold turns into prompt text within ``budget`` estimated tokens.
+
+    The newest ``SESSION_VERBATIM_TURNS`` turns are kept word for word when they
+    fit; older ones are condensed to the question plus the first sentence of
+    the answer. Whatever still does not fit is dropped, oldest first.
+    """
+    lines = []
+    remaining = budget - estimate_tokens("Previous conversation:")
+    for age, (question, answer) in enumerate(reversed(turns)):
+        if age >= settings.SESSION_VERBATIM_TURNS:
+            match = _FIRST_SENTENCE.match(answer.strip())
+            answer = match.group(1) if match else answer
+            question = truncate_to_tokens(question, settings.SESSION_CONDENSED_TURN_TOKENS)
+            answer = truncate_to_tokens(answer, settings.SESSION_CONDENSED_TURN_TOKENS)
+        text = f"User: {question}\nAssistant: {answer}"
+        cost = estimate_tokens(text)
+        if cost > remaining:
+            if lines:
+                break
+            # Even the latest turn is too long; keep a truncated version of it.
+            text = truncate_to_tokens(text, remaining)
+            cost = remaining
+        lines.append(text)
+        remaining -= cost
+        if remaining <= 0:
+            break
+
+    if not lines:
+        return ""
+    return "Previous conversation:\n" + "\n".join(reversed(lines))
+
+
+session_store = SessionStore(
+    max_sessions=settings.SESSION_CACHE_MAX_SESSIONS,
+    max_turns=settings.SESSION_MAX_TURNS,
+)
@@ -0,0 +1,31 @@
+import math
+import re
+
+# Word pieces, numbers and individual punctuation marks, roughly how BPE and
+# WordPiece tokenizers split English text.
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, tokenizer-free token estimate for prompt budgeting.
+
+    Long words split into several pieces, so each word is charged one token
+    per started four characters beyond the first four.
+    """
+    if not text:
+        return 0
+    return sum(1 + max(0, math.ceil((len(piece) - 4) / 4)) for piece in _PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, budget: int, ellipsis: str = "...") -> str:
+    """Cut ``text`` at a word boundary so it fits in ``budget`` estimated tokens."""
+    if estimate_tokens(text) <= budget:
+        return text
+    used = 0
+    end = 0
+    for match in _PIECES.finditer(text):
+        used += estimate_tokens(match.group())
+        if used > budget:
+            break
+        end = match.end()
+    return text[:end].rstrip() + ellipsis
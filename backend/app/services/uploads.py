@@ -0,0 +1,45 @@
+import hashlib
+import os
+import uuid
+from typing import Tuple
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+async def spool_upload(file: UploadFile, directory: str) -> Tuple[str, str]:
+    """Copy an upload to ``directory`` in UPLOAD_CHUNK_BYTES pieces.
+
+    Returns the new file's path and the SHA-256 of its bytes, hashed while
+    copying. At most one piece is held in memory, and the copy stops with
+    UploadTooLargeError as soon as MAX_UPLOAD_BYTES is exceeded; the partial
+    file is removed on any failure.
+    """
+    filepath = os.path.join(directory, f"{uuid.uuid4()}{os.path.splitext(file.filename)[1]}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(filepath, "wb") as f:
+            while True:
+                piece = await file.read(settings.UPLOAD_CHUNK_BYTES)
+                if not piece:
+                    break
+                size += len(piece)
+                if size > settings.MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError(
+                        f"{file.filename} is larger than the {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"
+                    )
+                digest.update(piece)
+                f.write(piece)
+    except BaseException:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+    finally:
+        await file.close()
+    return filepath, digest.hexdigest()
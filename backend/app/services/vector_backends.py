@@ -0,0 +1,284 @@
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.index_cache import index_registry
+from app.services.index_tiers import build_index, choose_tier, configure_search, index_tier, shard_kind
+from app.services.index_store import fingerprint_count, shard_store, tenant_fingerprint
+from app.services.vector_codec import decode_vectors, normalize_vectors, uses_cosine
+from models import Embedding
+
+
+def load_tenant_vectors(db: Session, user_id: str) -> Tuple[List[str], np.ndarray]:
+    """Load every stored embedding for a tenant as (chunk ids, float32 matrix).
+
+    Binary rows are decoded straight from their bytes; rows that still use the
+    legacy ARRAY(Float) column are only fetched when any remain.
+    """
+    blob_rows = (
+        db.query(Embedding.chunk_id, Embedding.vector_blob)
+        .filter(Embedding.user_id == user_id, Embedding.vector_blob.isnot(None))
+        .all()
+    )
+    array_rows = (
+        db.query(Embedding.chunk_id, Embedding.vector)
+        .filter(Embedding.user_id == user_id, Embedding.vector_blob.is_(None))
+        .all()
+    )
+    if not blob_rows and not array_rows:
+        return [], np.empty((0, 0), dtype=np.float32)
+
+    ids = [row.chunk_id for row in blob_rows] + [row.chunk_id for row in array_rows]
+    parts = []
+    if blob_rows:
+        parts.append(decode_vectors([row.vector_blob for row in blob_rows]))
+    if array_rows:
+        parts.append(np.array([row.vector for row in array_rows], dtype=np.float32))
+    return ids, parts[0] if len(parts) == 1 else np.vstack(parts)
+
+
+class FaissBackend:
+    """Search over per-tenant FAISS indexes held in process memory.
+
+    The index kind follows the tenant's size (see app.services.index_tiers):
+    exact for small tenants, HNSW/IVF-Flat and then IVF-PQ as they grow. On a
+    cache miss the tenant's on-disk shard is loaded if it is still current and
+    of the right kind; otherwise the index is rebuilt from the database, with
+    quantizers trained on the tenant's stored embeddings, and re-persisted.
+    """
+
+    name = "faiss"
+
+    def ensure_schema(self, engine: Engine) -> None:
+        pass
+
+    def store(self, db: Session, user_id: str, chunk_ids: List[str], vectors: np.ndarray) -> None:
+        # Vectors already live in the embeddings table; nothing else to write.
+        pass
+
+    def publish(self, db: Session, user_id: str, chunk_ids: List[str], vectors: np.ndarray) -> None:
+        cached = index_registry.cached_index(user_id)
+        if cached is not None and index_tier(cached) != choose_tier(cached.ntotal + len(chunk_ids)):
+            # The tenant outgrew its index kind: rebuild (and retrain) it now, on the
+            # ingestion worker, rather than on the next query.
+            index_registry.invalidate(user_id)
+            index_registry.warm(
+                user_id, lambda: self._load_index(db, user_id), lambda: tenant_fingerprint(db, user_id)
+            )
+            return
+
+        index_registry.add(user_id, chunk_ids, vectors)
+        fingerprint = tenant_fingerprint(db, user_id)
+        # Only a fingerprint the index provably matches may be recorded. If another
+        # job has committed rows it has not published yet, the counts differ and
+        # the shard is left alone (stale); that job's publish persists it.
+        count = fingerprint_count(fingerprint)
+        if index_registry.confirm(user_id, fingerprint, count) and shard_store is not None:
+
+            def write(index, ids):
+                # Re-checked under the entry lock: an append may have landed since
+                if len(ids) == count:
+                    shard_store.save(user_id, index, ids, fingerprint, shard_kind(index_tier(index)))
+
+            index_registry.persist(user_id, write)
+
+    def invalidate(self, user_id: str) -> None:
+        index_registry.invalidate(user_id)
+        if shard_store is not None:
+            shard_store.delete(user_id)
+
+    def search(self, db: Session, user_id: str, query_vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        return index_registry.search(
+            user_id,
+            query_vector.reshape(1, -1),
+            k,
+            loader=lambda: self._load_index(db, user_id),
+            version=lambda: tenant_fingerprint(db, user_id),
+        )
+
+    def _load_index(self, db: Session, user_id: str):
+        fingerprint = tenant_fingerprint(db, user_id)
+        tier = choose_tier(fingerprint_count(fingerprint))
+        if shard_store is not None:
+            shard = shard_store.load(user_id, fingerprint, shard_kind(tier))
+            if shard is not None:
+                index, ids, mapped = shard
+                return configure_search(index), ids, mapped
+
+        ids, vectors = load_tenant_vectors(db, user_id)
+        if not ids:
+            return None
+        if uses_cosine():
+            # Rows stored before cosine mode was enabled are not unit length yet
+            vectors = normalize_vectors(vectors)
+        index = build_index(vectors, choose_tier(len(ids)))
+        if shard_store is not None:
+            shard_store.save(user_id, index, ids, fingerprint, shard_kind(index_tier(index)))
+        return index, ids, False
+
+
+class PgvectorBackend:
+    """Approximate search inside Postgres using the pgvector extension.
+
+    Vectors are mirrored into ``embedding_vectors`` as a native ``vector`` column
+    with an HNSW or IVFFlat index, so a query ships only the top-k ids back.
+    The index is shared by every tenant and the user_id filter applies after
+    the index scan, which alone could return fewer than k rows for a small
+    tenant. Tenants up to PGVECTOR_EXACT_SEARCH_MAX_ROWS are therefore searched
+    exactly through the user_id index, and larger ones use iterative scans.
+    """
+
+    name = "pgvector"
+
+    def ensure_schema(self, engine: Engine) -> None:
+        # An index only serves queries using its operator class, so cosine mode gets its own.
+        ops, suffix = ("vector_cosine_ops", "_cosine") if uses_cosine() else ("vector_l2_ops", "")
+        if settings.PGVECTOR_INDEX_TYPE == "ivfflat":
+            index_sql = (
+                f"CREATE INDEX IF NOT EXISTS ix_embedding_vectors_ivfflat{suffix} ON embedding_vectors "
+                f"USING ivfflat (vector {ops}) WITH (lists = {settings.PGVECTOR_IVFFLAT_LISTS})"
+            )
+        else:
+            index_sql = (
+                f"CREATE INDEX IF NOT EXISTS ix_embedding_vectors_hnsw{suffix} ON embedding_vectors "
+                f"USING hnsw (vector {ops}) WITH (m = {settings.PGVECTOR_HNSW_M}, "
+                f"ef_construction = {settings.PGVECTOR_HNSW_EF_CONSTRUCTION})"
+            )
+
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS embedding_vectors ("
+                " chunk_id VARCHAR PRIMARY KEY REFERENCES document_chunks(id) ON DELETE CASCADE,"
+                " user_id VARCHAR NOT NULL REFERENCES users(id),"
+                f" vector vector({settings.EMBEDDING_DIMENSION}) NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_embedding_vectors_user_id ON embedding_vectors (user_id)"
+            ))
+
+            # Mirror every embedding not mirrored yet, including rows ingested while
+            # another backend was active (FaissBackend.store writes nothing here).
+            conn.execute(text(
+                "INSERT INTO embedding_vectors (chunk_id, user_id, vector) "
+                "SELECT e.chunk_id, e.user_id, CAST(e.vector AS vector) FROM embeddings e "
+                "WHERE e.vector IS NOT NULL AND NOT EXISTS "
+                "(SELECT 1 FROM embedding_vectors v WHERE v.chunk_id = e.chunk_id) "
+                "ON CONFLICT (chunk_id) DO NOTHING"
+            ))
+            self._backfill_blobs(conn)
+
+            # Build the ANN index after the backfill so it is built once, not row by row.
+            conn.execute(text(index_sql))
+
+    def _backfill_blobs(self, conn, batch_size: int = 1000) -> None:
+        """Mirror binary-only rows (e.g. after --drop-arrays), decoding them in Python."""
+        last_id = ""
+        while True:
+            rows = conn.execute(
+                text(
+                    "SELECT e.chunk_id, e.user_id, e.vector_blob FROM embeddings e "
+                    "WHERE e.chunk_id > :last_id AND e.vector IS NULL AND e.vector_blob IS NOT NULL "
+                    "AND NOT EXISTS (SELECT 1 FROM embedding_vectors v WHERE v.chunk_id = e.chunk_id) "
+                    "ORDER BY e.chunk_id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).all()
+            if not rows:
+                return
+            vectors = decode_vectors([row.vector_blob for row in rows])
+            conn.execute(
+                text(
+                    "INSERT INTO embedding_vectors (chunk_id, user_id, vector) "
+                    "VALUES (:chunk_id, :user_id, CAST(:vector AS vector)) "
+                    "ON CONFLICT (chunk_id) DO NOTHING"
+                ),
+                [
+                    {"chunk_id": row.chunk_id, "user_id": row.user_id, "vector": _to_literal(vector)}
+                    for row, vector in zip(rows, vectors)
+                ],
+            )
+            last_id = rows[-1].chunk_id
+
+    def store(self, db: Session, user_id: str, chunk_ids: List[str], vectors: np.ndarray) -> None:
+        if not chunk_ids:
+            return
+        db.execute(
+            text(
+                "INSERT INTO embedding_vectors (chunk_id, user_id, vector) "
+                "VALUES (:chunk_id, :user_id, CAST(:vector AS vector)) "
+                "ON CONFLICT (chunk_id) DO UPDATE SET vector = EXCLUDED.vector"
+            ),
+            [
+                {"chunk_id": chunk_id, "user_id": user_id, "vector": _to_literal(vector)}
+                for chunk_id, vector in zip(chunk_ids, vectors)
+            ],
+        )
+
+    def publish(self, db: Session, user_id: str, chunk_ids: List[str], vectors: np.ndarray) -> None:
+        # Rows become visible to searches when the ingest transaction commits.
+        pass
+
+    def invalidate(self, user_id: str) -> None:
+        pass
+
+    def search(self, db: Session, user_id: str, query_vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        operator = "<=>" if uses_cosine() else "<->"
+        order_by = f"vector {operator} CAST(:query AS vector)"
+        if self._tenant_rows(db, user_id) <= settings.PGVECTOR_EXACT_SEARCH_MAX_ROWS:
+            # An ORDER BY expression the ANN index cannot serve: exact distances
+            # over the tenant's rows, found through the user_id index.
+            order_by = f"({order_by}) + 0"
+        else:
+            kind = "ivfflat" if settings.PGVECTOR_INDEX_TYPE == "ivfflat" else "hnsw"
+            if kind == "ivfflat":
+                db.execute(text(f"SET LOCAL ivfflat.probes = {settings.PGVECTOR_IVFFLAT_PROBES}"))
+            else:
+                db.execute(text(f"SET LOCAL hnsw.ef_search = {max(settings.PGVECTOR_HNSW_EF_SEARCH, k)}"))
+            if settings.PGVECTOR_ITERATIVE_SCAN != "off":
+                db.execute(text(f"SET LOCAL {kind}.iterative_scan = {settings.PGVECTOR_ITERATIVE_SCAN}"))
+
+        rows = db.execute(
+            text(
+                f"SELECT chunk_id, vector {operator} CAST(:query AS vector) AS distance "
+                "FROM embedding_vectors WHERE user_id = :user_id "
+                f"ORDER BY {order_by} LIMIT :k"
+            ),
+            {"query": _to_literal(query_vector.ravel()), "user_id": user_id, "k": k},
+        ).all()
+        if uses_cosine():
+            # <=> is cosine distance; report similarity like the FAISS inner-product index.
+            return [(row.chunk_id, 1.0 - float(row.distance)) for row in rows]
+        # pgvector returns plain L2; square it to match FAISS IndexFlatL2 distances.
+        return [(row.chunk_id, float(row.distance) ** 2) for row in rows]
+
+
+    def _tenant_rows(self, db: Session, user_id: str) -> int:
+        """The tenant's row count, counted no further than the exact-search threshold."""
+        return db.execute(
+            text("SELECT count(*) FROM (SELECT 1 FROM embedding_vectors WHERE user_id = :user_id LIMIT :cap) t"),
+            {"user_id": user_id, "cap": settings.PGVECTOR_EXACT_SEARCH_MAX_ROWS + 1},
+        ).scalar()
+
+
+def _to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+
+_BACKENDS = {
+    FaissBackend.name: FaissBackend,
+    PgvectorBackend.name: PgvectorBackend,
+}
+
+
+def create_vector_backend(name: str):
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown retrieval backend '{name}', expected one of {sorted(_BACKENDS)}")
+    return _BACKENDS[name]()
+
+
+vector_backend = create_vector_backend(settings.RETRIEVAL_BACKEND)
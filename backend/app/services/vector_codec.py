@@ -0,0 +1,61 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+# Little-endian on disk regardless of host byte order.
+STORAGE_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+
+def uses_blob_storage() -> bool:
+    return settings.VECTOR_STORAGE in STORAGE_DTYPES
+
+
+def encode_vector(vector: np.ndarray, storage: Optional[str] = None) -> bytes:
+    """Pack one embedding into contiguous little-endian bytes."""
+    dtype = STORAGE_DTYPES[storage or settings.VECTOR_STORAGE]
+    return np.ascontiguousarray(vector, dtype=dtype).tobytes()
+
+
+def decode_vector(blob: bytes, dimension: Optional[int] = None) -> np.ndarray:
+    """View a stored blob as a vector without copying; the width is inferred from its length."""
+    return np.frombuffer(blob, dtype=_dtype_for(len(blob), dimension or settings.EMBEDDING_DIMENSION))
+
+
+def decode_vectors(blobs: Sequence[bytes], dimension: Optional[int] = None) -> np.ndarray:
+    """Decode many blobs into one float32 matrix with a single buffer join."""
+    dimension = dimension or settings.EMBEDDING_DIMENSION
+    if not blobs:
+        return np.empty((0, dimension), dtype=np.float32)
+    dtype = _dtype_for(len(blobs[0]), dimension)
+    if any(len(blob) != len(blobs[0]) for blob in blobs):
+        # Rows written under different storage modes; decode one at a time.
+        return np.vstack([decode_vector(blob, dimension).astype(np.float32) for blob in blobs])
+    matrix = np.frombuffer(b"".join(blobs), dtype=dtype).reshape(len(blobs), dimension)
+    return matrix if dtype == np.float32 else matrix.astype(np.float32)
+
+
+def _dtype_for(nbytes: int, dimension: int) -> np.dtype:
+    for dtype in STORAGE_DTYPES.values():
+        if nbytes == dimension * dtype.itemsize:
+            return dtype
+    raise ValueError(f"Vector blob of {nbytes} bytes does not match dimension {dimension}")
+
+
+def uses_cosine() -> bool:
+    return settings.SIMILARITY_METRIC == "cosine"
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 copies of ``vectors`` (one or many) scaled to unit length.
+
+    Always copies, so vectors shared with a cache are never modified in place.
+    """
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
@@ -0,0 +1,115 @@
+"""Measure chunk + embedding write throughput for each ingestion write path.
+
+Run from the backend directory against a scratch database:
+
+    python -m benchmarks.bench_bulk_insert --chunks 5000
+
+"orm" reproduces the original path: one db.add per chunk, a commit, a
+re-query for the chunk ids, one db.add per embedding and a second commit.
+"executemany" and "copy" use app.services.bulk_writes in one transaction.
+Each run writes into a throwaway user and document that are deleted again.
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.bulk_writes import insert_chunks, insert_embeddings
+from app.services.vector_codec import encode_vector, uses_blob_storage
+from database import SessionLocal
+from models import Document, DocumentChunk, Embedding, PlanType, SubscriptionType, User
+
+
+def _vector_columns(vector) -> dict:
+    if uses_blob_storage():
+        return {"vector": None, "vector_blob": encode_vector(vector)}
+    return {"vector": vector.tolist(), "vector_blob": None}
+
+
+def write_orm(db, user_id, document_id, texts, vectors) -> None:
+    for index, content in enumerate(texts):
+        db.add(DocumentChunk(document_id=document_id, content=content, chunk_index=index))
+    db.commit()
+    chunks = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).order_by(DocumentChunk.chunk_index).all()
+    for chunk, vector in zip(chunks, vectors):
+        db.add(Embedding(user_id=user_id, chunk_id=chunk.id, **_vector_columns(vector)))
+    db.commit()
+
+
+def write_bulk(db, user_id, document_id, texts, vectors, batch_size: int) -> None:
+    created_at = datetime.utcnow()
+    for start in range(0, len(texts), batch_size):
+        chunk_rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "document_id": document_id,
+                "content": content,
+                "content_hash": None,
+                "chunk_index": start + offset,
+                "page_start": None,
+                "page_end": None,
+            }
+            for offset, content in enumerate(texts[start:start + batch_size])
+        ]
+        insert_chunks(db, chunk_rows)
+        insert_embeddings(db, [
+            {"id": str(uuid.uuid4()), "user_id": user_id, "chunk_id": row["id"], "created_at": created_at,
+             **_vector_columns(vector)}
+            for row, vector in zip(chunk_rows, vectors[start:start + batch_size])
+        ])
+    db.commit()
+
+
+def run(chunks: int, batch_size: int) -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((chunks, settings.EMBEDDING_DIMENSION)).astype(np.float32)
+    texts = [f"Chunk {i}: " + "lorem ipsum dolor sit amet " * 30 for i in range(chunks)]
+
+    db = SessionLocal()
+    user = User(
+        name="bench", company_name="bench", email=f"bench-{uuid.uuid4()}@example.com", password="x",
+        plan=PlanType.BASIC, subscription_type=SubscriptionType.MONTHLY,
+        subscription_end_date=datetime.utcnow() + timedelta(days=1),
+    )
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    print(f"{chunks} chunks + embeddings, storage={settings.VECTOR_STORAGE}")
+    print(f"{'method':<14}{'seconds':>10}{'rows/s':>12}")
+    try:
+        for method in ("orm", "executemany", "copy"):
+            document = Document(user_id=user_id, filename=f"bench-{method}.pdf")
+            db.add(document)
+            db.commit()
+            document_id = document.id
+
+            settings.BULK_INSERT_METHOD = method
+            start = time.perf_counter()
+            if method == "orm":
+                write_orm(db, user_id, document_id, texts, vectors)
+            else:
+                write_bulk(db, user_id, document_id, texts, vectors, batch_size)
+            elapsed = time.perf_counter() - start
+            # Each chunk is two rows: the chunk and its embedding
+            print(f"{method:<14}{elapsed:>10.2f}{2 * chunks / elapsed:>12,.0f}")
+
+            db.query(Embedding).filter(Embedding.user_id == user_id).delete(synchronize_session=False)
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete(synchronize_session=False)
+            db.query(Document).filter(Document.id == document_id).delete(synchronize_session=False)
+            db.commit()
+    finally:
+        db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+    run(args.chunks, args.batch_size)
@@ -0,0 +1,98 @@
+"""Compare chunking strategies by retrieval recall and chunking throughput.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_chunking --k 3
+
+Each strategy chunks the labeled fixture documents, the chunks and questions
+are embedded with the configured embedding model, and a question counts as
+found at k when one of its k nearest chunks contains the whole answer span.
+Throughput is measured on the chunking step alone (token counting included),
+over ``--repeat`` copies of the fixture pages.
+"""
+import argparse
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.services.chunking import ChunkingConfig, chunk_pages
+from app.services.embeddings import count_model_tokens, embedding_model
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "chunking_recall.json")
+
+
+def fixed_chars(pages, chunk_size: int = 1000, chunk_overlap: int = 100) -> List[str]:
+    """The original splitter: fixed character windows over the joined text."""
+    text = "\n".join(page for _, page in pages)
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size - chunk_overlap)]
+
+
+def structured(**overrides) -> Callable:
+    config = ChunkingConfig(**overrides)
+    return lambda pages: [chunk.text for chunk in chunk_pages(pages, config, count_model_tokens)]
+
+
+STRATEGIES: Dict[str, Callable] = {
+    "fixed-1000-chars": fixed_chars,
+    "tokens-200": structured(),
+    "tokens-128": structured(target_tokens=128, overlap_tokens=24),
+    "tokens-200-flat": structured(split_on_headings=False, respect_paragraphs=False, prepend_heading=False),
+}
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def run(k: int, repeat: int) -> None:
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    documents = [list(enumerate(doc["pages"], start=1)) for doc in fixture["documents"]]
+    questions = [item["question"] for item in fixture["questions"]]
+    answers = [_normalize(item["answer"]) for item in fixture["questions"]]
+    question_vectors = embedding_model.encode(questions, normalize_embeddings=True)
+    words = sum(len(page.split()) for pages in documents for _, page in pages)
+
+    print(f"{len(questions)} questions, {sum(len(pages) for pages in documents)} pages, {words:,} words")
+    print(f"{'strategy':<20}{'chunks':>8}{'avg tokens':>12}{'truncated':>11}"
+          f"{'recall@1':>10}{f'recall@{k}':>10}{'pages/s':>10}{'words/s':>12}")
+
+    for name, split in STRATEGIES.items():
+        chunks = [chunk for pages in documents for chunk in split(pages)]
+        tokens = [count_model_tokens(chunk) for chunk in chunks]
+        # Chunks longer than the model's window are silently cut off when embedded
+        truncated = sum(1 for count in tokens if count + 2 > embedding_model.max_seq_length)
+
+        chunk_vectors = embedding_model.encode(chunks, normalize_embeddings=True)
+        ranking = np.argsort(-(question_vectors @ chunk_vectors.T), axis=1)
+        normalized = [_normalize(chunk) for chunk in chunks]
+        hits_at_1 = hits_at_k = 0
+        for answer, ranked in zip(answers, ranking):
+            found = [answer in normalized[i] for i in ranked[:k]]
+            hits_at_1 += found[0]
+            hits_at_k += any(found)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for pages in documents:
+                split(pages)
+        elapsed = time.perf_counter() - start
+        page_count = repeat * sum(len(pages) for pages in documents)
+
+        print(
+            f"{name:<20}{len(chunks):>8}{sum(tokens) / len(tokens):>12.0f}{truncated:>11}"
+            f"{hits_at_1 / len(questions):>10.2f}{hits_at_k / len(questions):>10.2f}"
+            f"{page_count / elapsed:>10,.0f}{repeat * words / elapsed:>12,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    run(args.k, args.repeat)
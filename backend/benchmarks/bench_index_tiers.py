@@ -0,0 +1,84 @@
+"""Compare recall@k and query latency of the FAISS index tiers.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_index_tiers --sizes 10000,100000 --k 10
+    python -m benchmarks.bench_index_tiers --user-id <tenant id>
+
+Synthetic runs draw clustered vectors, which behave much more like sentence
+embeddings than uniform noise; --user-id benchmarks a real tenant's stored
+embeddings instead. Queries are held-out vectors, and recall@k is measured
+against exact flat search. The current FAISS_* and INDEX_TIER_* settings are
+used, so they can be tuned through the environment and compared run to run.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.index_tiers import TIERS, build_index, choose_tier, index_nbytes
+
+
+def clustered_vectors(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 500, 8), dimension)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=count)
+    return centers[labels] + 0.35 * rng.standard_normal((count, dimension)).astype(np.float32)
+
+
+def run(vectors: np.ndarray, queries: int, k: int) -> None:
+    base, probe = vectors[:-queries], vectors[-queries:]
+    print(f"\n{len(base):,} vectors, dimension {base.shape[1]}, {queries} queries, "
+          f"tier chosen for this size: {choose_tier(len(base))}")
+    print(f"{'tier':<10}{'build (s)':>11}{'size (MB)':>11}{f'recall@{k}':>11}{'avg ms':>9}{'p95 ms':>9}")
+
+    truth = None
+    for tier in TIERS:
+        if tier != "flat" and len(base) < 10000:
+            continue  # not enough points to train quantizers meaningfully
+        start = time.perf_counter()
+        index = build_index(base, tier)
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty((queries, k), dtype=np.int64)
+        for row in range(queries):
+            start = time.perf_counter()
+            _, positions = index.search(probe[row:row + 1], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[row] = positions[0]
+        if truth is None:
+            truth = found  # flat runs first and is exact
+        recall = np.mean([len(set(found[row]) & set(truth[row])) / k for row in range(queries)])
+
+        print(f"{tier:<10}{build_seconds:>11.2f}{index_nbytes(index) / 2**20:>11.1f}{recall:>11.3f}"
+              f"{np.mean(latencies):>9.3f}{np.percentile(latencies, 95):>9.3f}")
+
+
+def load_tenant(user_id: str) -> np.ndarray:
+    from app.services.vector_backends import load_tenant_vectors
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        _, vectors = load_tenant_vectors(db, user_id)
+    finally:
+        db.close()
+    return np.random.default_rng(0).permutation(vectors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated synthetic corpus sizes")
+    parser.add_argument("--user-id", help="benchmark this tenant's stored embeddings instead")
+    parser.add_argument("--dimension", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.user_id:
+        run(load_tenant(args.user_id), args.queries, args.k)
+    else:
+        for size in (int(value) for value in args.sizes.split(",")):
+            run(clustered_vectors(size + args.queries, args.dimension), args.queries, args.k)
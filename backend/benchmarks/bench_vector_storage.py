@@ -0,0 +1,74 @@
+"""Compare table size and load time of ARRAY(Float) vs binary vector storage.
+
+Run from the backend directory against a scratch database:
+
+    python -m benchmarks.bench_vector_storage --rows 20000
+
+Each representation gets its own temporary table filled with the same random
+vectors; the tables are dropped when the run finishes.
+"""
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from app.services.vector_codec import decode_vectors, encode_vector
+from database import engine
+
+LAYOUTS = {
+    "array": "DOUBLE PRECISION[]",
+    "float32": "BYTEA",
+    "float16": "BYTEA",
+}
+
+
+def run(rows: int, dimension: int, batch_size: int) -> None:
+    vectors = np.random.default_rng(0).standard_normal((rows, dimension)).astype(np.float32)
+    print(f"{'storage':<10}{'table size':>14}{'bytes/row':>12}{'load (s)':>12}{'rows/s':>14}")
+
+    for storage, column_type in LAYOUTS.items():
+        table = f"bench_vectors_{storage}"
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            conn.execute(text(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, vector {column_type})"))
+            for start in range(0, rows, batch_size):
+                batch = vectors[start:start + batch_size]
+                conn.execute(
+                    text(f"INSERT INTO {table} (id, vector) VALUES (:id, :vector)"),
+                    [
+                        {
+                            "id": start + i,
+                            "vector": vector.tolist() if storage == "array" else encode_vector(vector, storage),
+                        }
+                        for i, vector in enumerate(batch)
+                    ],
+                )
+            conn.execute(text(f"ANALYZE {table}"))
+
+        try:
+            with engine.connect() as conn:
+                size = conn.execute(text(f"SELECT pg_total_relation_size('{table}')")).scalar()
+
+                start_time = time.perf_counter()
+                loaded = [row.vector for row in conn.execute(text(f"SELECT vector FROM {table}"))]
+                if storage == "array":
+                    matrix = np.array(loaded, dtype=np.float32)
+                else:
+                    matrix = decode_vectors(loaded, dimension)
+                elapsed = time.perf_counter() - start_time
+
+            assert matrix.shape == (rows, dimension)
+            print(f"{storage:<10}{size:>14,}{size / rows:>12,.0f}{elapsed:>12.3f}{rows / elapsed:>14,.0f}")
+        finally:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.rows, args.dimension, args.batch_size)
@@ -0,0 +1,195 @@
+"""Measure /query latency with and without document ingestion in flight.
+
+Run against a live server (python -m benchmarks.load_query_during_upload --help),
+ideally started with ANSWER_CACHE_ENABLED=false QUERY_CACHE_ENABLED=false:
+
+    python -m benchmarks.load_query_during_upload \
+        --token $TOKEN --user-id $USER_ID --pdf big-manual.pdf
+
+/upload only queues the files (202), so the second phase polls the queued
+jobs until one is running and keeps querying until all of them are done.
+Each copy of the PDF gets a unique trailer so duplicate detection does not
+skip it. Questions rotate through --queries-file (or a built-in list) with a
+unique suffix, and answers served from the answer cache are counted apart
+rather than mixed into the latencies.
+
+Latency should stay roughly flat between the two phases now that parsing,
+embedding and LLM calls run on their own worker pools.
+"""
+import argparse
+import itertools
+import statistics
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+import requests
+
+QUESTIONS = [
+    "What is the refund policy?",
+    "How do I reset my password?",
+    "Which plans include priority support?",
+    "How long is the warranty period?",
+    "What happens when a payment fails?",
+    "Who do I contact about a billing error?",
+    "How is personal data stored and protected?",
+    "Can I cancel my subscription at any time?",
+    "What are the shipping options and costs?",
+    "How do I export my data?",
+]
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.cached = 0
+        self.failed = 0
+
+
+def run_queries(
+    base_url: str,
+    token: str,
+    user_id: str,
+    questions: List[str],
+    clients: int,
+    per_client: int,
+    stop: Optional[threading.Event] = None,
+) -> Results:
+    """Send ``per_client`` queries per client, or keep going until ``stop`` is set."""
+    results = Results()
+    counter = itertools.count()
+
+    def client():
+        sent = 0
+        while (stop is None and sent < per_client) or (stop is not None and not stop.is_set()):
+            question = questions[next(counter) % len(questions)]
+            start = time.perf_counter()
+            response = requests.post(
+                f"{base_url}/query",
+                headers={"Authorization": f"Bearer {token}"},
+                # The suffix keeps the exact-text query embedding cache from answering
+                json={"query": f"{question} ({uuid.uuid4().hex[:8]})", "user_id": user_id},
+                timeout=300,
+            )
+            elapsed = time.perf_counter() - start
+            sent += 1
+            with results.lock:
+                if response.status_code != 200:
+                    results.failed += 1
+                elif response.json().get("cached"):
+                    results.cached += 1
+                else:
+                    results.latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def upload(base_url: str, token: str, pdf_path: str, copies: int) -> List[str]:
+    """Queue ``copies`` distinct copies of the PDF and return the queued job ids.
+
+    Job ids rather than the batch id: /upload only creates a batch for more
+    than one file.
+    """
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+    files = [
+        ("files", (f"load-test-{i}.pdf", data + f"\n% load-test {uuid.uuid4()}\n".encode(), "application/pdf"))
+        for i in range(copies)
+    ]
+    response = requests.post(
+        f"{base_url}/upload",
+        headers={"Authorization": f"Bearer {token}"},
+        files=files,
+        timeout=600,
+    )
+    response.raise_for_status()
+    job_ids = [job["job_id"] for job in response.json()["jobs"] if job["job_id"]]
+    if not job_ids:
+        raise RuntimeError(f"No files were queued: {response.json()['jobs']}")
+    return job_ids
+
+
+def job_statuses(base_url: str, token: str, job_ids: List[str]) -> List[dict]:
+    jobs = []
+    for job_id in job_ids:
+        response = requests.get(
+            f"{base_url}/jobs/{job_id}", headers={"Authorization": f"Bearer {token}"}, timeout=30
+        )
+        response.raise_for_status()
+        jobs.append(response.json())
+    return jobs
+
+
+def all_finished(jobs: List[dict]) -> bool:
+    return all(job["finished_at"] is not None for job in jobs)
+
+
+def wait_until_running(base_url: str, token: str, job_ids: List[str], timeout: float = 600) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = job_statuses(base_url, token, job_ids)
+        if any(job["status"] == "running" for job in jobs) or all_finished(jobs):
+            return
+        time.sleep(0.2)
+    raise TimeoutError(f"No ingestion job started within {timeout:.0f}s")
+
+
+def watch_jobs(base_url: str, token: str, job_ids: List[str], done: threading.Event) -> None:
+    try:
+        while not all_finished(job_statuses(base_url, token, job_ids)):
+            time.sleep(0.5)
+    finally:
+        done.set()
+
+
+def report(label: str, results: Results) -> None:
+    extra = f"cached={results.cached} failed={results.failed}"
+    if not results.latencies:
+        print(f"{label:<16} no uncached successful queries ({extra})")
+        return
+    ordered = sorted(results.latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:<16} n={len(ordered):<5} p50={statistics.median(ordered):.3f}s "
+        f"p95={p95:.3f}s max={ordered[-1]:.3f}s {extra}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--pdf", required=True, help="A large PDF to upload during the second phase")
+    parser.add_argument("--copies", type=int, default=3)
+    parser.add_argument("--queries-file", help="Questions to rotate through, one per line")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--per-client", type=int, default=10, help="Queries per client in the idle phase")
+    args = parser.parse_args()
+
+    questions = QUESTIONS
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    report("idle", run_queries(args.base_url, args.token, args.user_id, questions, args.clients, args.per_client))
+
+    job_ids = upload(args.base_url, args.token, args.pdf, args.copies)
+    wait_until_running(args.base_url, args.token, job_ids)
+    ingestion_done = threading.Event()
+    watcher = threading.Thread(target=watch_jobs, args=(args.base_url, args.token, job_ids, ingestion_done))
+    watcher.start()
+    started = time.perf_counter()
+    during = run_queries(
+        args.base_url, args.token, args.user_id, questions, args.clients, args.per_client, stop=ingestion_done
+    )
+    watcher.join()
+    report("during ingest", during)
+    print(f"ingestion of {len(job_ids)} files finished {time.perf_counter() - started:.1f}s after it started")
@@ -1,22 +1,20 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr, validator
 from typing import List, Optional
+from collections import deque
+import itertools
 import uuid
 import os
 import re
 from dotenv import load_dotenv
-import fitz  # PyMuPDF
-from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
 import requests
 import json
-from docx import Document  # for DOC files
-from database import get_db, init_db
-from models import User, Document as DBDocument, DocumentChunk, Embedding, SubscriptionType, PlanType
+from database import get_db, init_db, engine, SessionLocal
+from models import User, Document as DBDocument, DocumentChunk, Embedding, SubscriptionType, PlanType, TenantChunkingConfig
 from sqlalchemy.orm import Session
 from generate_postman import generate_postman_collection
 from datetime import datetime, timedelta
@@ -27,6 +25,28 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from urllib.parse import quote
 from jinja2 import Environment, FileSystemLoader
+from app.core.config import settings
+from app.services import executors
+from app.services.dedup import chunk_hash, find_duplicate_document, find_reusable_embeddings
+from app.services.bulk_writes import insert_chunks, insert_embeddings
+from app.services.chunking import ChunkingConfig, chunk_pages, get_chunking_config
+from app.services.embeddings import count_model_tokens, embed_query, embedding_batcher
+from app.services.query_cache import query_embedding_cache
+from app.services import llm, llm_routing
+from app.services.answer_cache import answer_cache
+from app.services.context import context_budget, pack_context
+from app.services.index_cache import index_registry
+from app.services.index_store import current_fingerprint
+from app.services.ingestion import IngestionJob, QueueFullError, ingestion_queue
+from app.services.llm_routing import choose_route
+from app.services.parsing import count_pdf_pages, extract_pdf_page_range, extract_text_from_doc, parse_and_chunk
+from app.services.reranker import reranker
+from app.services.retrieval import RETRIEVAL_MODES, retrieval_latency, retrieve_chunks, timed
+from app.services.sessions import build_history_text, session_store
+from app.services.tokens import estimate_tokens
+from app.services.uploads import UploadTooLargeError, spool_upload
+from app.services.vector_backends import vector_backend
+from app.services.vector_codec import encode_vector, normalize_vectors, uses_blob_storage, uses_cosine
 
 # Load environment variables
 load_dotenv()
@@ -78,14 +98,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-index = None
-documents = []
-
-# Define paths for storage
-EMBEDDINGS_FILE = "embeddings.json"
-DOCUMENTS_FILE = "documents.json"
-
 def send_email(to_email: str, subject: str, template_name: str, template_data: dict):
     """Send email using SMTP with Jinja2 template."""
     try:
@@ -215,6 +227,30 @@ class QueryRequest(BaseModel):
     query: str
     session_id: Optional[str] = None
     user_id: str
+    top_k: Optional[int] = None
+    retrieval_mode: Optional[str] = None
+    rerank: Optional[bool] = None  # defaults to on when RERANK_ENABLED
+    include_sources: bool = False
+    stream: bool = False
+    stream_format: str = "sse"
+
+    @validator('stream_format')
+    def validate_stream_format(cls, v):
+        if v not in ("sse", "ndjson"):
+            raise ValueError('stream_format must be "sse" or "ndjson"')
+        return v
+
+    @validator('retrieval_mode')
+    def validate_retrieval_mode(cls, v):
+        if v is not None and v not in RETRIEVAL_MODES:
+            raise ValueError(f'retrieval_mode must be one of {", ".join(RETRIEVAL_MODES)}')
+        return v
+
+    @validator('top_k')
+    def validate_top_k(cls, v):
+        if v is not None and not 1 <= v <= settings.RETRIEVAL_MAX_K:
+            raise ValueError(f'top_k must be between 1 and {settings.RETRIEVAL_MAX_K}')
+        return v
 
 # Password reset models
 class PasswordResetRequest(BaseModel):
@@ -469,141 +505,336 @@ def update_user(
     db.refresh(db_user)
     return db_user
 
-def extract_text_from_pdf(filepath):
-    doc = fitz.open(filepath)
-    return "\n".join([page.get_text() for page in doc])
-
-def extract_text_from_doc(filepath):
-    doc = Document(filepath)
-    return "\n".join([paragraph.text for paragraph in doc.paragraphs])
-
-async def process_file(file: UploadFile, user_id: str, db: Session):
-    if not file.filename.lower().endswith(('.pdf', '.doc', '.docx')):
-        raise HTTPException(status_code=400, detail="Only PDF and DOC files allowed")
+def extract_pdf_pages(filepath, job: Optional[IngestionJob] = None):
+    """Yield (page number, text) for a PDF, extracted on the parse pool.
+
+    Pages are parsed a batch per task with at most one batch per parse worker
+    in flight, so only a few batches of page text are held at any time however
+    long the document is.
+    """
+    page_count = executors.run_sync("parse", count_pdf_pages, filepath)
+    if job:
+        job.pages_total = page_count
+
+    batch = settings.INGEST_PARSE_PAGE_BATCH
+    starts = iter(range(0, page_count, batch))
+    in_flight = deque()
+
+    def submit_next():
+        start = next(starts, None)
+        if start is not None:
+            in_flight.append((start, executors.submit("parse", extract_pdf_page_range, filepath, start, start + batch)))
+
+    for _ in range(settings.PARSE_POOL_SIZE):
+        submit_next()
+    while in_flight:
+        start, future = in_flight.popleft()
+        texts = future.result()
+        submit_next()
+        for offset, text in enumerate(texts):
+            yield start + offset + 1, text
+        if job:
+            job.pages_parsed = start + len(texts)
+
+def process_file(job: IngestionJob):
+    """Parse, chunk and embed one uploaded file. Runs on an ingestion worker."""
+    db = SessionLocal()
+    try:
+        _process_file(job, db)
+    finally:
+        db.close()
+        # Clean up the file
+        if os.path.exists(job.filepath):
+            os.remove(job.filepath)
+
+def _process_file(job: IngestionJob, db: Session):
+    user_id = job.user_id
+
+    # An identical upload may have finished while this one was queued
+    if job.content_hash and settings.DUPLICATE_UPLOAD_POLICY != "allow":
+        existing = find_duplicate_document(db, user_id, job.content_hash)
+        if existing:
+            job.document_id = existing.id
+            return
 
     file_id = str(uuid.uuid4())
-    filepath = os.path.join(UPLOAD_DIR, f"{file_id}{os.path.splitext(file.filename)[1]}")
-    
-    content = await file.read()
-    with open(filepath, "wb") as f:
-        f.write(content)
-
-    # Extract text based on file type
-    if file.filename.lower().endswith('.pdf'):
-        text = extract_text_from_pdf(filepath)
+    job.document_id = file_id
+    config = get_chunking_config(db, user_id)
+
+    if os.path.getsize(job.filepath) <= settings.INGEST_WHOLE_FILE_MAX_BYTES:
+        # Parse and chunk on a worker process; concurrent jobs run on separate cores
+        job.pages_total, pieces = executors.run_sync("chunk", parse_and_chunk, job.filepath, config.dict())
+        job.pages_parsed = job.pages_total or 0
+    elif job.filename.lower().endswith('.pdf'):
+        # Too large to hold whole: stream pages through the chunker
+        pieces = chunk_pages(extract_pdf_pages(job.filepath, job), config, count_model_tokens)
     else:  # .doc or .docx
-        text = extract_text_from_doc(filepath)
+        pages = [(None, executors.run_sync("parse", extract_text_from_doc, job.filepath))]
+        pieces = chunk_pages(pages, config, count_model_tokens)
 
-    # Create document record
+    # The document, its chunks and embeddings are written in one transaction, so
+    # a failed ingestion leaves nothing behind and duplicates are only ever
+    # detected against fully ingested documents. The text lives only in the chunks.
     db_document = DBDocument(
         id=file_id,
         user_id=user_id,
-        filename=file.filename,
-        content=text
+        filename=job.filename,
+        content_hash=job.content_hash
     )
     db.add(db_document)
-    db.commit()
+    db.flush()
 
-    # Split into chunks and create embeddings
-    chunk_size = 1000
-    chunk_overlap = 100
-    chunks = []
-    for i in range(0, len(text), chunk_size - chunk_overlap):
-        chunk_text = text[i:i+chunk_size]
-        chunk = DocumentChunk(
-            document_id=file_id,
-            content=chunk_text,
-            chunk_index=len(chunks)
-        )
-        db.add(chunk)
-        chunks.append(chunk_text)
-    
-    db.commit()
-
-    # Generate embeddings
-    embeddings = embedding_model.encode(chunks)
-    
-    # Store embeddings
-    for chunk, embedding in zip(db.query(DocumentChunk).filter(DocumentChunk.document_id == file_id).all(), embeddings):
-        db_embedding = Embedding(
-            user_id=user_id,
-            chunk_id=chunk.id,
-            vector=embedding.tolist()
-        )
-        db.add(db_embedding)
-    
-    db.commit()
-
-    # Clean up the file
-    os.remove(filepath)
-    
-    return len(chunks)
-
-@app.post("/upload", tags=["Document Management"])
+    try:
+        chunk_ids, vectors = _ingest_chunks(job, db, file_id, pieces)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if not chunk_ids:
+        return
+
+    # Make the new vectors searchable without a rebuild
+    vector_backend.publish(db, user_id, chunk_ids, vectors)
+    if answer_cache:
+        answer_cache.invalidate(user_id)
+
+def _ingest_chunks(job: IngestionJob, db: Session, file_id: str, pieces):
+    """Embed and write chunks as they arrive, one embedding batch at a time.
+
+    Only the current batch of chunk text is held in memory; rows go out as
+    bulk inserts in the caller's transaction. The returned ids and vectors are
+    what the vector backend needs to publish the document. Embedding requests
+    from concurrent jobs are merged by the embedding batcher.
+    """
+    user_id = job.user_id
+    pieces = iter(pieces)
+    job.chunks_total = 0
+
+    chunk_ids = []
+    batches = []
+    batch_size = settings.INGEST_EMBED_BATCH_SIZE
+    while True:
+        batch = [
+            {
+                "id": str(uuid.uuid4()),
+                "document_id": file_id,
+                "content": piece.text,
+                "content_hash": chunk_hash(piece.text),
+                "chunk_index": job.chunks_total + offset,
+                "page_start": piece.page_start,
+                "page_end": piece.page_end
+            }
+            for offset, piece in enumerate(itertools.islice(pieces, batch_size))
+        ]
+        if not batch:
+            break
+        job.chunks_total += len(batch)
+
+        # Reuse vectors for chunk text this tenant has embedded before
+        known = find_reusable_embeddings(db, user_id, [chunk["content_hash"] for chunk in batch])
+        missing = list({chunk["content_hash"]: chunk["content"] for chunk in batch if chunk["content_hash"] not in known}.items())
+        if missing:
+            encoded = embedding_batcher.encode([text for _, text in missing])
+            known.update(zip([h for h, _ in missing], encoded))
+        embeddings = np.asarray([known[chunk["content_hash"]] for chunk in batch], dtype=np.float32)
+        if uses_cosine():
+            embeddings = normalize_vectors(embeddings)
+        job.chunks_reused += len(batch) - len(missing)
+
+        # Store chunks and embeddings with one bulk statement each
+        batch_ids = [chunk["id"] for chunk in batch]
+        created_at = datetime.utcnow()
+        insert_chunks(db, batch)
+        insert_embeddings(db, [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "chunk_id": chunk_id,
+                "created_at": created_at,
+                **_vector_columns(embedding)
+            }
+            for chunk_id, embedding in zip(batch_ids, embeddings)
+        ])
+        vector_backend.store(db, user_id, batch_ids, embeddings)
+
+        chunk_ids.extend(batch_ids)
+        batches.append(embeddings)
+        job.chunks_embedded += len(batch)
+
+    if not chunk_ids:
+        return [], None
+    return chunk_ids, np.vstack(batches)
+
+def _vector_columns(embedding) -> dict:
+    if uses_blob_storage():
+        return {"vector": None, "vector_blob": encode_vector(embedding)}
+    return {"vector": embedding.tolist(), "vector_blob": None}
+
+def delete_document_rows(db: Session, document_id: str):
+    """Delete a document's embeddings, chunks and the document itself (uncommitted)."""
+    chunk_ids = db.query(DocumentChunk.id).filter(DocumentChunk.document_id == document_id).scalar_subquery()
+    db.query(Embedding).filter(Embedding.chunk_id.in_(chunk_ids)).delete(synchronize_session=False)
+    db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete(synchronize_session=False)
+    db.query(DBDocument).filter(DBDocument.id == document_id).delete(synchronize_session=False)
+
+@app.post("/upload", status_code=202, tags=["Document Management"])
 async def upload_files(
     files: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Upload one or more documents (PDF or DOC) for processing."""
+    """Upload one or more documents (PDF or DOC) and queue them for processing."""
     if not current_user.is_verified:
         raise HTTPException(
             status_code=403,
             detail="Please verify your email address before uploading documents"
         )
     
-    total_chunks = 0
     for file in files:
-        chunks = await process_file(file, current_user.id, db)
-        total_chunks += chunks
+        if not file.filename.lower().endswith(('.pdf', '.doc', '.docx')):
+            raise HTTPException(status_code=400, detail="Only PDF and DOC files allowed")
+
+    # Files of one upload share a batch id so their progress can be polled together
+    batch_id = str(uuid.uuid4()) if len(files) > 1 else None
+    jobs = []
+    for file in files:
+        # Spooled to disk piece by piece; parsing later reads from that file
+        try:
+            filepath, file_hash = await spool_upload(file, UPLOAD_DIR)
+        except UploadTooLargeError as e:
+            jobs.append({"job_id": None, "filename": file.filename, "status": "too_large", "detail": str(e)})
+            continue
+
+        # Skip parsing and embedding entirely for a file this tenant already uploaded
+        existing = None
+        if settings.DUPLICATE_UPLOAD_POLICY != "allow":
+            existing = find_duplicate_document(db, current_user.id, file_hash)
+        if existing:
+            os.remove(filepath)
+            jobs.append({
+                "job_id": None,
+                "filename": file.filename,
+                "status": "linked" if settings.DUPLICATE_UPLOAD_POLICY == "link" else "duplicate",
+                "document_id": existing.id
+            })
+            continue
+
+        job = IngestionJob(
+            user_id=current_user.id,
+            batch_id=batch_id,
+            filename=file.filename,
+            filepath=filepath,
+            content_hash=file_hash
+        )
+        try:
+            ingestion_queue.submit(job)
+        except QueueFullError:
+            os.remove(filepath)
+            jobs.append({"job_id": None, "filename": file.filename, "status": "rejected"})
+            continue
+        jobs.append({"job_id": job.id, "filename": job.filename, "status": job.status})
+
+    queued = sum(1 for job in jobs if job["job_id"])
+    if not queued and all(job["status"] == "duplicate" for job in jobs):
+        raise HTTPException(status_code=409, detail="These documents have already been uploaded")
+    if not queued and all(job["status"] == "too_large" for job in jobs):
+        raise HTTPException(status_code=413, detail=jobs[0]["detail"])
+    if not queued and any(job["status"] == "rejected" for job in jobs):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many documents are being processed. Please retry shortly."
+        )
 
     return {
-        "message": f"Processed {len(files)} files",
-        "total_chunks": total_chunks
+        "message": f"Queued {queued} of {len(files)} files for processing",
+        "batch_id": batch_id,
+        "jobs": jobs
     }
 
-@app.post("/query", tags=["Query"])
-async def ask_question(
-    query_request: QueryRequest,
+@app.get("/jobs/{job_id}", tags=["Document Management"])
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Report the progress of a document ingestion job."""
+    job = ingestion_queue.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.public_dict()
+
+@app.get("/batches/{batch_id}", tags=["Document Management"])
+async def get_batch(batch_id: str, current_user: User = Depends(get_current_user)):
+    """Report per-file progress for a multi-file upload."""
+    jobs = [job for job in ingestion_queue.batch(batch_id) if job.user_id == current_user.id]
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    counts = {}
+    for job in jobs:
+        counts[job.status.value] = counts.get(job.status.value, 0) + 1
+    return {
+        "batch_id": batch_id,
+        "files": len(jobs),
+        "status_counts": counts,
+        "done": all(job.finished_at is not None for job in jobs),
+        "jobs": [job.public_dict() for job in jobs]
+    }
+
+@app.delete("/documents/{document_id}", tags=["Document Management"])
+async def delete_document(
+    document_id: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Ask a question about the uploaded documents."""
-    # Verify user exists
-    if current_user.id != query_request.user_id:
-        raise HTTPException(status_code=403, detail="Not authorized to query this user's documents")
-
-    # Get all embeddings for the user
-    embeddings = db.query(Embedding).filter(Embedding.user_id == query_request.user_id).all()
-    if not embeddings:
-        raise HTTPException(status_code=400, detail="No documents uploaded for this user")
+    """Delete a document together with its chunks and embeddings."""
+    document = db.query(DBDocument).filter(
+        DBDocument.id == document_id,
+        DBDocument.user_id == current_user.id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    delete_document_rows(db, document_id)
+    db.commit()
 
-    # Create FAISS index
-    dimension = len(embeddings[0].vector)
-    index = faiss.IndexFlatL2(dimension)
-    vectors = np.array([e.vector for e in embeddings])
-    index.add(vectors)
+    # Drop everything derived from the old corpus
+    vector_backend.invalidate(current_user.id)
+    if answer_cache:
+        answer_cache.invalidate(current_user.id)
 
-    # Embed the query
-    query_embedding = embedding_model.encode([query_request.query])
-    D, I = index.search(np.array(query_embedding), k=3)
+    return {"message": "Document deleted"}
 
-    # Get relevant chunks
-    chunks = []
-    for idx in I[0]:
-        chunk = db.query(DocumentChunk).join(Embedding).filter(Embedding.id == embeddings[idx].id).first()
-        if chunk:
-            chunks.append(chunk.content)
+@app.get("/settings/chunking", response_model=ChunkingConfig, tags=["Document Management"])
+async def get_chunking_settings(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Chunking settings applied to this account's future uploads."""
+    return get_chunking_config(db, current_user.id)
 
-    context = "\n".join(chunks)
-    
-    # Build conversation history
-    history_text = ""
-    if query_request.session_id:
-        # Implement conversation history storage and retrieval here
-        pass
+@app.put("/settings/chunking", response_model=ChunkingConfig, tags=["Document Management"])
+async def update_chunking_settings(
+    config: ChunkingConfig,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Change how future uploads are chunked. Existing documents keep their chunks
+    until they are uploaded again."""
+    if config.target_tokens > settings.CHUNK_MAX_TOKENS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"target_tokens cannot exceed {settings.CHUNK_MAX_TOKENS}, the embedding model's input size"
+        )
+    if config.overlap_tokens >= config.target_tokens:
+        raise HTTPException(status_code=400, detail="overlap_tokens must be smaller than target_tokens")
+
+    row = db.query(TenantChunkingConfig).filter(TenantChunkingConfig.user_id == current_user.id).first()
+    if row is None:
+        row = TenantChunkingConfig(user_id=current_user.id)
+        db.add(row)
+    for field, value in config.dict().items():
+        setattr(row, field, value)
+    db.commit()
+    return config
 
-    prompt = f"""You are an empathetic and emotionally intelligent AI assistant. Respond to the following question with both factual accuracy and emotional awareness. 
+def build_prompt(context: str, history_text: str, question: str) -> str:
+    return f"""You are an empathetic and emotionally intelligent AI assistant. Respond to the following question with both factual accuracy and emotional awareness. 
     Consider the user's potential emotional state and provide a warm, understanding response while maintaining professionalism.
 
 Context from documents:
@@ -611,7 +842,7 @@ Context from documents:
 
 {history_text}
 
-Current question: {query_request.query}
+Current question: {question}
 
 Guidelines for your response:
 1. Be empathetic and understanding
@@ -622,30 +853,212 @@ Guidelines for your response:
 
 Answer:"""
 
-    response = requests.post("http://localhost:11434/api/generate", json={"model": "mistral", "prompt": prompt})
-    if response.status_code != 200:
-        raise HTTPException(status_code=500, detail="LLM failed to generate response")
-    
-    full_response = ""
-    for line in response.text.strip().split('\n'):
-        if line:
-            try:
-                json_response = json.loads(line)
-                if 'response' in json_response:
-                    full_response += json_response['response']
-            except json.JSONDecodeError:
-                continue
+@app.post("/query", tags=["Query"])
+async def ask_question(
+    query_request: QueryRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Ask a question about the uploaded documents.
 
-    return {
-        "answer": full_response.strip(),
-        "session_id": query_request.session_id or str(uuid.uuid4())
+    With ``stream`` set, tokens are forwarded as Ollama produces them, either as
+    Server-Sent Events or as newline-delimited JSON.
+    """
+    # Verify user exists
+    if current_user.id != query_request.user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to query this user's documents")
+
+    timings = {}
+
+    # Embed the query
+    with timed(timings, "embed"):
+        query_vector = await embed_query(query_request.query)
+
+    # Vector search (FAISS or pgvector), full-text search, or both fused.
+    # With reranking, over-fetch candidates for the cross-encoder to choose from.
+    retrieval_mode = query_request.retrieval_mode or settings.RETRIEVAL_MODE
+    top_k = query_request.top_k or settings.RETRIEVAL_TOP_K
+    use_reranker = reranker is not None and query_request.rerank is not False
+    # Runs on the search pool: loading a tenant's index can take a while
+    hits, chunks = await executors.run_in_pool(
+        "search",
+        retrieve_chunks,
+        query_request.user_id,
+        query_request.query,
+        query_vector,
+        k=max(top_k, settings.RERANK_CANDIDATES) if use_reranker else top_k,
+        mode=retrieval_mode,
+        timings=timings
+    )
+    if not hits:
+        if retrieval_mode == "vector" and settings.RETRIEVAL_MIN_SCORE <= 0:
+            raise HTTPException(status_code=400, detail="No documents uploaded for this user")
+        # Lexical matching or the relevance cutoff can leave nothing to answer from
+        raise HTTPException(status_code=404, detail="No relevant document passages found")
+
+    if use_reranker:
+        chunks = await reranker.rerank(query_request.query, chunks, top_k, timings)
+
+    # Build conversation history
+    history_text = ""
+    if query_request.session_id:
+        turns = await session_store.load(query_request.user_id, query_request.session_id)
+        history_text = build_history_text(turns, settings.SESSION_HISTORY_TOKEN_BUDGET)
+
+    # Pick the model and Ollama replica from the plan, prompt size and load
+    route = choose_route(
+        current_user.plan,
+        estimate_tokens(build_prompt("", history_text, query_request.query)),
+        sum(estimate_tokens(chunk.content) for chunk in chunks)
+    )
+
+    # Pack the best chunks, minus duplicated overlap, into the model's context budget
+    with timed(timings, "pack_context"):
+        packed = pack_context(chunks, context_budget(route.model))
+    chunks = packed.chunks
+
+    prompt = build_prompt(packed.text, history_text, query_request.query)
+
+    result = {
+        "session_id": query_request.session_id or str(uuid.uuid4()),
+        "model": route.model,
+        "timings_ms": timings
     }
+    if query_request.include_sources:
+        result["sources"] = [chunk.dict() for chunk in chunks]
+
+    # Reuse the answer to a near-identical question that retrieved the same chunks
+    # and was routed to the same model.
+    # Follow-up questions depend on the conversation too, so they are never cached.
+    chunk_ids = [chunk.chunk_id for chunk in chunks]
+    cached_answer = None
+    documents_version = None
+    if answer_cache and not history_text:
+        # Another worker may have changed this tenant's documents since answers were cached
+        documents_version = await executors.run_in_pool("search", current_fingerprint, query_request.user_id)
+        cached_answer = answer_cache.get(
+            query_request.user_id, query_vector, chunk_ids, route.model, documents_version
+        )
+
+    def remember(answer: str):
+        if answer_cache and not history_text:
+            answer_cache.put(
+                query_request.user_id, query_vector, chunk_ids, answer, route.model, documents_version
+            )
+        session_store.record(query_request.user_id, result["session_id"], query_request.query, answer)
+
+    if query_request.stream:
+        if cached_answer is not None:
+            result["cached"] = True
+            session_store.record(query_request.user_id, result["session_id"], query_request.query, cached_answer)
+            return streaming_response(
+                stream_answer(request, cached_answer, replay(), result, query_request.stream_format),
+                query_request.stream_format
+            )
+
+        # Start generating before sending headers so a full queue is still a 429
+        tokens = llm.stream_generate(prompt, route.model, route.base_url)
+        try:
+            first_token = await anext(tokens, None)
+        except llm.LLMError as e:
+            raise llm_http_error(e)
+        return streaming_response(
+            stream_answer(request, first_token, tokens, result, query_request.stream_format, remember),
+            query_request.stream_format
+        )
+
+    if cached_answer is not None:
+        result["answer"] = cached_answer
+        result["cached"] = True
+        session_store.record(query_request.user_id, result["session_id"], query_request.query, cached_answer)
+        return result
+
+    try:
+        full_response = await llm.generate(prompt, route.model, route.base_url)
+    except llm.LLMError as e:
+        raise llm_http_error(e)
+
+    result["answer"] = full_response.strip()
+    remember(result["answer"])
+    return result
+
+def streaming_response(events, stream_format: str) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream" if stream_format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def replay():
+    """An empty token stream, for answers that are already complete."""
+    return
+    yield
+
+def llm_http_error(error: Exception) -> HTTPException:
+    if isinstance(error, llm.LLMQueueFullError):
+        return HTTPException(
+            status_code=429,
+            detail="The assistant is busy. Please retry shortly.",
+            headers={"Retry-After": "5"}
+        )
+    if isinstance(error, llm.LLMTimeoutError):
+        return HTTPException(status_code=504, detail="LLM timed out generating a response")
+    return HTTPException(status_code=500, detail="LLM failed to generate response")
+
+def format_stream_event(stream_format: str, event: str, data: dict) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, **data}) + "\n"
+
+async def stream_answer(request: Request, first_token: Optional[str], tokens, result: dict, stream_format: str, on_complete=None):
+    """Relay LLM tokens to the client, ending with a summary event.
+
+    Closing ``tokens`` closes the upstream stream, so a client disconnect stops
+    the generation in Ollama instead of letting it run to completion.
+    """
+    answer = []
+    try:
+        if first_token is not None:
+            answer.append(first_token)
+            yield format_stream_event(stream_format, "token", {"token": first_token})
+        async for token in tokens:
+            if await request.is_disconnected():
+                return
+            answer.append(token)
+            yield format_stream_event(stream_format, "token", {"token": token})
+    except llm.LLMError as e:
+        yield format_stream_event(stream_format, "error", {"detail": llm_http_error(e).detail})
+        return
+    finally:
+        await tokens.aclose()
+
+    full_answer = "".join(answer).strip()
+    if on_complete:
+        on_complete(full_answer)
+    yield format_stream_event(stream_format, "done", {**result, "answer": full_answer})
 
 @app.get("/", tags=["Health"])
 def read_root():
     """Health check endpoint."""
     return {"message": "Multi-tenant Document AI Chatbot API running"}
 
+@app.get("/metrics", tags=["Health"])
+def read_metrics():
+    """Runtime counters for the retrieval caches."""
+    return {
+        "index_cache": index_registry.stats(),
+        "ingestion": ingestion_queue.stats(),
+        "pools": executors.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "query_embedding_cache": query_embedding_cache.stats() if query_embedding_cache else None,
+        "llm": llm.stats(),
+        "llm_routing": llm_routing.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "retrieval_latency": retrieval_latency.stats(),
+        "reranker": reranker.stats() if reranker else None
+    }
+
 @app.get("/generate-postman", tags=["Documentation"])
 async def generate_postman_docs():
     """Generate and push the Postman collection directly to Postman."""
@@ -689,6 +1102,12 @@ async def startup_event():
     """Initialize database and update Postman collection on startup."""
     # Initialize database
     init_db()
+    vector_backend.ensure_schema(engine)
+    if reranker is not None:
+        await reranker.warm()
+
+    # Start background ingestion workers
+    ingestion_queue.start(process_file)
     
     # Generate and update Postman collection
     try:
@@ -715,4 +1134,11 @@ async def startup_event():
             else:
                 print("Postman collection updated successfully")
     except Exception as e:
-        print(f"Warning: Failed to update Postman collection: {str(e)}")
\ No newline at end of file
+        print(f"Warning: Failed to update Postman collection: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background ingestion workers and worker pools."""
+    await ingestion_queue.stop()
+    executors.shutdown_pools()
+    await llm.close_client()
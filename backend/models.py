@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON, DateTime, Text, ARRAY, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON, DateTime, Text, ARRAY, Enum, Boolean, LargeBinary, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import uuid
@@ -16,6 +17,9 @@ class PlanType(enum.Enum):
 
 Base = declarative_base()
 
+# Postgres text search configuration behind DocumentChunk.content_tsv and lexical queries
+TEXT_SEARCH_CONFIG = "english"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -46,7 +50,8 @@ class Document(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     filename = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    content = Column(Text)  # Legacy full text; new documents keep their text only in chunks
+    content_hash = Column(String(64), index=True)  # SHA-256 of the uploaded file bytes
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -59,7 +64,15 @@ class DocumentChunk(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     document_id = Column(String, ForeignKey("documents.id"), nullable=False)
     content = Column(Text, nullable=False)
+    content_hash = Column(String(64), index=True)  # SHA-256 of the chunk text
     chunk_index = Column(Integer, nullable=False)
+    page_start = Column(Integer)  # First and last source page; NULL for formats without pages
+    page_end = Column(Integer)
+    content_tsv = Column(TSVECTOR, Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', content)", persisted=True))
+    
+    __table_args__ = (
+        Index("ix_document_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
+    )
     
     # Relationships
     document = relationship("Document", back_populates="chunks")
@@ -72,8 +85,30 @@ class Embedding(Base):
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     chunk_id = Column(String, ForeignKey("document_chunks.id"), unique=True, nullable=False)
     vector = Column(ARRAY(Float))
+    vector_blob = Column(LargeBinary)  # Little-endian float32/float16 bytes, see VECTOR_STORAGE
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="embeddings")
-    chunk = relationship("DocumentChunk", back_populates="embedding") 
\ No newline at end of file
+    chunk = relationship("DocumentChunk", back_populates="embedding") 
+
+class ConversationTurn(Base):
+    __tablename__ = "conversation_turns"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    session_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TenantChunkingConfig(Base):
+    __tablename__ = "tenant_chunking_configs"
+    
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    target_tokens = Column(Integer, nullable=False)
+    overlap_tokens = Column(Integer, nullable=False)
+    split_on_headings = Column(Boolean, nullable=False, default=True)
+    respect_paragraphs = Column(Boolean, nullable=False, default=True)
+    prepend_heading = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,28 @@
+"""Add the page-range columns recorded on document chunks.
+
+Run from the backend directory:
+
+    python -m scripts.migrate_chunk_pages
+
+Chunks created before this change keep NULL page numbers; re-upload a
+document to re-chunk it with page tracking.
+"""
+from sqlalchemy import text
+
+from database import engine
+
+STATEMENTS = [
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS page_start INTEGER",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS page_end INTEGER",
+]
+
+
+def migrate() -> None:
+    with engine.begin() as conn:
+        for statement in STATEMENTS:
+            conn.execute(text(statement))
+
+
+if __name__ == "__main__":
+    migrate()
+    print("Done")
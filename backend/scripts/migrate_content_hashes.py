@@ -0,0 +1,47 @@
+"""Add content-hash columns used for upload deduplication and backfill chunk hashes.
+
+Run from the backend directory:
+
+    python -m scripts.migrate_content_hashes
+
+Chunk hashes are computed inside Postgres from the stored text. Original file
+bytes are not kept after ingestion, so existing documents cannot be hashed;
+only documents uploaded from now on are deduplicated at the file level.
+"""
+from sqlalchemy import text
+
+from database import engine
+
+STATEMENTS = [
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_hash ON document_chunks (content_hash)",
+]
+
+
+def migrate(batch_size: int = 5000) -> int:
+    with engine.begin() as conn:
+        for statement in STATEMENTS:
+            conn.execute(text(statement))
+
+    updated = 0
+    while True:
+        with engine.begin() as conn:
+            result = conn.execute(
+                text(
+                    "UPDATE document_chunks SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') "
+                    "WHERE id IN (SELECT id FROM document_chunks WHERE content_hash IS NULL LIMIT :limit)"
+                ),
+                {"limit": batch_size},
+            )
+        if result.rowcount == 0:
+            break
+        updated += result.rowcount
+        print(f"Hashed {updated} chunks")
+    return updated
+
+
+if __name__ == "__main__":
+    total = migrate()
+    print(f"Done: {total} chunks hashed")
@@ -0,0 +1,47 @@
+"""Make documents.content optional now that document text is kept only in chunks.
+
+Run from the backend directory:
+
+    python -m scripts.migrate_document_content [--clear]
+
+With --clear the full text stored for existing documents is also removed,
+which reclaims its space after the next VACUUM.
+"""
+import argparse
+
+from sqlalchemy import text
+
+from database import engine
+
+
+STATEMENTS = ["ALTER TABLE documents ALTER COLUMN content DROP NOT NULL"]
+
+
+def migrate(clear: bool = False, batch_size: int = 1000) -> int:
+    with engine.begin() as conn:
+        for statement in STATEMENTS:
+            conn.execute(text(statement))
+
+    cleared = 0
+    while clear:
+        with engine.begin() as conn:
+            result = conn.execute(
+                text(
+                    "UPDATE documents SET content = NULL "
+                    "WHERE id IN (SELECT id FROM documents WHERE content IS NOT NULL LIMIT :limit)"
+                ),
+                {"limit": batch_size},
+            )
+        if result.rowcount == 0:
+            break
+        cleared += result.rowcount
+        print(f"Cleared {cleared} documents")
+    return cleared
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clear", action="store_true", help="also drop the stored text of existing documents")
+    args = parser.parse_args()
+    migrate(args.clear)
+    print("Done")
@@ -0,0 +1,30 @@
+"""Add the full-text search column and GIN index used by lexical and hybrid retrieval.
+
+Run from the backend directory:
+
+    python -m scripts.migrate_lexical_index
+
+Adding a stored generated column rewrites document_chunks, so run it during a
+quiet period on large installations.
+"""
+from sqlalchemy import text
+
+from database import engine
+from models import TEXT_SEARCH_CONFIG
+
+STATEMENTS = [
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', content)) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_tsv ON document_chunks USING gin (content_tsv)",
+]
+
+
+def migrate() -> None:
+    with engine.begin() as conn:
+        for statement in STATEMENTS:
+            conn.execute(text(statement))
+
+
+if __name__ == "__main__":
+    migrate()
+    print("Done")
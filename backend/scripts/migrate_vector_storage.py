@@ -0,0 +1,88 @@
+"""Convert stored embeddings from ARRAY(Float) to compact binary blobs.
+
+Run from the backend directory:
+
+    python -m scripts.migrate_vector_storage --storage float16 --drop-arrays
+    python -m scripts.migrate_vector_storage --schema-only
+
+The script adds ``embeddings.vector_blob`` if it is missing, then rewrites rows
+in keyset-paginated batches so it can be stopped and resumed at any time.
+Set VECTOR_STORAGE to the same value afterwards so new uploads match.
+
+Deployments staying on VECTOR_STORAGE=array still need the column, since
+reads and writes reference it; ``--schema-only`` (or scripts.upgrade_schema,
+which also runs at startup) adds it and leaves every row as it is.
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.services.vector_codec import STORAGE_DTYPES, encode_vector
+from database import engine
+
+
+STATEMENTS = ["ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS vector_blob BYTEA"]
+
+
+def add_blob_column() -> None:
+    with engine.begin() as conn:
+        for statement in STATEMENTS:
+            conn.execute(text(statement))
+
+
+def migrate(storage: str, batch_size: int, drop_arrays: bool) -> int:
+    add_blob_column()
+
+    converted = 0
+    last_id = ""
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, vector FROM embeddings "
+                    "WHERE id > :last_id AND vector_blob IS NULL AND vector IS NOT NULL "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).all()
+            if not rows:
+                break
+
+            conn.execute(
+                text(
+                    "UPDATE embeddings SET vector_blob = :blob"
+                    + (", vector = NULL" if drop_arrays else "")
+                    + " WHERE id = :id"
+                ),
+                [{"id": row.id, "blob": encode_vector(row.vector, storage)} for row in rows],
+            )
+        converted += len(rows)
+        last_id = rows[-1].id
+        print(f"Converted {converted} embeddings")
+
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storage", choices=sorted(STORAGE_DTYPES), default="float32")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--drop-arrays",
+        action="store_true",
+        help="Null out the ARRAY(Float) column once a row is converted (run VACUUM FULL embeddings afterwards to reclaim space)",
+    )
+    parser.add_argument(
+        "--schema-only",
+        action="store_true",
+        help="Only add the vector_blob column; keep existing rows in the ARRAY(Float) column",
+    )
+    args = parser.parse_args()
+
+    if args.schema_only:
+        add_blob_column()
+        print("Added embeddings.vector_blob; no rows converted")
+        raise SystemExit
+
+    total = migrate(args.storage, args.batch_size, args.drop_arrays)
+    print(f"Done: {total} embeddings stored as {args.storage}")
@@ -0,0 +1,48 @@
+"""Bring an existing database's schema up to date with models.py.
+
+Run from the backend directory (startup also runs it, see SCHEMA_UPGRADE_ON_STARTUP):
+
+    python -m scripts.upgrade_schema
+
+create_all only creates missing tables, so columns and indexes added to
+existing tables are applied here. Every statement is idempotent. Data
+backfills stay optional follow-ups, run when convenient:
+
+    python -m scripts.migrate_content_hashes          # hash existing chunks for dedup
+    python -m scripts.migrate_vector_storage --storage float16 --drop-arrays
+    python -m scripts.migrate_document_content --clear
+
+Adding the full-text column rewrites document_chunks once, so the first
+upgrade of a large installation is best run by hand during a quiet period.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from scripts import (
+    migrate_chunk_pages,
+    migrate_content_hashes,
+    migrate_document_content,
+    migrate_lexical_index,
+    migrate_vector_storage,
+)
+
+STATEMENTS = (
+    migrate_content_hashes.STATEMENTS
+    + migrate_vector_storage.STATEMENTS
+    + migrate_chunk_pages.STATEMENTS
+    + migrate_document_content.STATEMENTS
+    + migrate_lexical_index.STATEMENTS
+)
+
+
+def upgrade(engine: Engine) -> None:
+    with engine.begin() as conn:
+        for statement in STATEMENTS:
+            conn.execute(text(statement))
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    upgrade(engine)
+    print(f"Schema up to date ({len(STATEMENTS)} statements applied)")
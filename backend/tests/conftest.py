@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the backend the way main.py does, from the backend directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Nothing here talks to Postgres; an in-memory engine keeps imports cheap.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.services.answer_cache import SemanticAnswerCache
+
+
+def make_cache():
+    return SemanticAnswerCache(threshold=0.95, max_tenants=10, max_per_tenant=10, ttl_seconds=0)
+
+
+def test_answer_reused_while_documents_unchanged():
+    cache = make_cache()
+    vector = np.ones(4, dtype=np.float32)
+    cache.put("tenant", vector, ["c1"], "answer", "mistral", "3:a")
+    assert cache.get("tenant", vector, ["c1"], "mistral", "3:a") == "answer"
+
+
+def test_answers_dropped_when_documents_changed_elsewhere():
+    cache = make_cache()
+    vector = np.ones(4, dtype=np.float32)
+    cache.put("tenant", vector, ["c1"], "answer", "mistral", "3:a")
+    assert cache.get("tenant", vector, ["c1"], "mistral", "2:a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answers_are_kept_per_model():
+    cache = make_cache()
+    vector = np.ones(4, dtype=np.float32)
+    cache.put("tenant", vector, ["c1"], "answer", "mistral", "3:a")
+    assert cache.get("tenant", vector, ["c1"], "phi3", "3:a") is None
@@ -0,0 +1,68 @@
+import base64
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services.chunking import ChunkingConfig, chunk_pages
+from app.services.tokens import estimate_tokens
+
+
+def chunk_texts(text, **overrides):
+    return list(chunk_pages([(1, text)], ChunkingConfig(**overrides), estimate_tokens))
+
+
+def assert_within_limit(chunks):
+    assert chunks
+    for chunk in chunks:
+        assert estimate_tokens(chunk.text) <= settings.CHUNK_MAX_TOKENS
+        assert chunk.token_count <= settings.CHUNK_MAX_TOKENS
+
+
+def test_unbroken_run_is_split_to_the_limit():
+    url = "https://example.com/" + "a1b2c3d4e5" * 300
+    chunks = chunk_texts(f"See {url} for details. The end.", target_tokens=1000)
+    assert_within_limit(chunks)
+    assert "".join(chunk.text for chunk in chunks).count("a1b2c3d4e5") == 300
+
+
+def test_base64_blob_is_split_to_the_limit():
+    blob = base64.b64encode(os.urandom(3000)).decode()
+    assert_within_limit(chunk_texts(f"Attachment:\n\n{blob}"))
+
+
+def test_long_heading_leaves_room_for_the_body():
+    heading = "# " + " ".join(f"Heading{i}" for i in range(400))
+    body = " ".join(f"Sentence {i} has some words in it." for i in range(200))
+    chunks = chunk_texts(f"{heading}\n\n{body}", target_tokens=1000)
+    assert_within_limit(chunks)
+    assert all(estimate_tokens(chunk.heading) <= settings.CHUNK_MAX_TOKENS // 2 for chunk in chunks)
+
+
+@pytest.mark.parametrize("target", [16, 64, 200])
+def test_small_targets_hold_with_headings(target):
+    text = "# " + "Verylongheadingword" * 40 + "\n\n" + "Word " * 500
+    for chunk in chunk_texts(text, target_tokens=target):
+        assert chunk.token_count <= min(target, settings.CHUNK_MAX_TOKENS)
+
+
+def test_title_case_line_inside_a_paragraph_is_not_a_heading():
+    text = (
+        "The company was founded in 1990. It grew quickly.\n"
+        "John Smith And Mary Jones\n"
+        "were the founders and ran it together."
+    )
+    chunks = chunk_texts(text)
+    assert len(chunks) == 1
+    assert chunks[0].heading is None
+    assert "John Smith And Mary Jones were the founders" in chunks[0].text
+
+
+def test_title_case_heading_after_blank_line():
+    chunks = chunk_texts("Intro text here.\n\nRefund Policy\nRefunds are issued within 30 days.")
+    assert chunks[-1].heading == "Refund Policy"
+
+
+def test_title_case_heading_followed_by_capitalised_text():
+    chunks = chunk_texts("Intro text here.\nRefund Policy\nRefunds are issued within 30 days.")
+    assert chunks[-1].heading == "Refund Policy"
@@ -0,0 +1,84 @@
+import threading
+
+import faiss
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.index_cache import TenantIndexRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_CACHE_REVALIDATE_SECONDS", 0)
+    return TenantIndexRegistry(max_tenants=10, max_bytes=2**30)
+
+
+def loader_for(vectors, ids, calls):
+    def load():
+        calls.append(len(ids))
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        return index, list(ids), False
+    return load
+
+
+def test_rebuilds_when_another_process_changed_the_rows(registry):
+    vectors = np.random.default_rng(0).random((4, 8), dtype=np.float32)
+    calls = []
+    version = {"value": "4:a"}
+    search = lambda rows: registry.search(
+        "tenant", vectors[:1], 10, loader_for(vectors[:rows], [str(i) for i in range(rows)], calls),
+        lambda: version["value"],
+    )
+
+    assert len(search(4)) == 4
+    assert len(search(4)) == 4
+    assert calls == [4]
+
+    # A delete handled elsewhere: the count in the fingerprint changes
+    version["value"] = "3:a"
+    assert len(search(3)) == 3
+    assert calls == [4, 3]
+
+
+def test_confirm_only_when_counts_match(registry):
+    vectors = np.random.default_rng(1).random((3, 8), dtype=np.float32)
+    registry.warm("tenant", loader_for(vectors, ["a", "b", "c"], []), lambda: "3:x")
+    assert not registry.confirm("tenant", "4:y", 4)
+    assert registry.confirm("tenant", "3:y", 3)
+
+
+def test_add_skips_ids_already_in_the_index(registry):
+    vectors = np.random.default_rng(2).random((5, 8), dtype=np.float32)
+    registry.warm("tenant", loader_for(vectors[:4], ["a", "b", "c", "d"], []))
+    registry.add("tenant", ["c", "d", "e"], vectors[2:])
+    assert registry.cached_index("tenant").ntotal == 5
+    hits = registry.search("tenant", vectors[4:5], 5, loader=None)
+    assert sorted(chunk_id for chunk_id, _ in hits) == ["a", "b", "c", "d", "e"]
+
+
+def test_concurrent_searches_and_appends(registry):
+    rng = np.random.default_rng(3)
+    vectors = rng.random((100, 8), dtype=np.float32)
+    registry.warm("tenant", loader_for(vectors, [str(i) for i in range(100)], []))
+    errors = []
+
+    def searcher():
+        try:
+            for _ in range(200):
+                assert registry.search("tenant", vectors[:1], 5, loader=None)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=searcher) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for batch in range(20):
+        ids = [f"new-{batch}-{i}" for i in range(5)]
+        registry.add("tenant", ids, rng.random((5, 8), dtype=np.float32))
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert registry.cached_index("tenant").ntotal == 200
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import llm
+from app.services.llm_routing import choose_route, plan_models
+from models import PlanType
+
+REPLICA_A = "http://ollama-a:11434"
+REPLICA_B = "http://ollama-b:11434"
+
+
+@pytest.fixture(autouse=True)
+def routing_settings(monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_BASE_URLS", f"{REPLICA_A},{REPLICA_B}")
+    monkeypatch.setattr(settings, "LLM_PLAN_MODELS", "basic=phi3,pro=mistral,enterprise=llama3:70b|mistral")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_MODEL", "phi3")
+    monkeypatch.setattr(settings, "LLM_MODEL_CONTEXT_TOKENS", "phi3=2048,mistral=8192")
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 1500)
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGETS", "")
+    monkeypatch.setattr(settings, "LLM_MAX_IN_FLIGHT_PER_MODEL", 2)
+    monkeypatch.setattr(settings, "LLM_MAX_QUEUE_PER_MODEL", 4)
+    monkeypatch.setattr(settings, "LLM_FALLBACK_QUEUE_DEPTH", 1)
+    llm._limiters.clear()
+    llm._clients.clear()
+    yield
+    llm._limiters.clear()
+    llm._clients.clear()
+
+
+def busy(model, base_url, in_flight=2, waiting=1):
+    limiter = llm.get_limiter(model, base_url)
+    limiter.in_flight = in_flight
+    limiter.waiting = waiting
+    return limiter
+
+
+def test_plan_models_keep_order_and_append_fallback():
+    assert plan_models(PlanType.BASIC) == ["phi3"]
+    assert plan_models(PlanType.PRO) == ["mistral", "phi3"]
+    assert plan_models(PlanType.ENTERPRISE) == ["llama3:70b", "mistral", "phi3"]
+
+
+def test_plan_without_entry_uses_default_model(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PLAN_MODELS", "")
+    assert plan_models(PlanType.PRO) == [settings.LLM_MODEL, "phi3"]
+
+
+def test_primary_model_when_idle():
+    route = choose_route(PlanType.ENTERPRISE, base_tokens=300, context_tokens=1000)
+    assert route.model == "llama3:70b"
+    assert not route.fallback
+
+
+def test_falls_back_when_primary_saturated_on_every_replica():
+    busy("mistral", REPLICA_A)
+    busy("mistral", REPLICA_B)
+    route = choose_route(PlanType.PRO, base_tokens=300, context_tokens=1000)
+    assert route.model == "phi3"
+    assert route.fallback
+
+
+def test_no_fallback_while_a_replica_has_room():
+    busy("mistral", REPLICA_A)
+    route = choose_route(PlanType.PRO, base_tokens=300, context_tokens=1000)
+    assert route.model == "mistral"
+    assert route.base_url == REPLICA_B
+
+
+def test_queues_for_first_model_when_everything_is_saturated():
+    for model in ("mistral", "phi3"):
+        busy(model, REPLICA_A)
+        busy(model, REPLICA_B)
+    route = choose_route(PlanType.PRO, base_tokens=300, context_tokens=1000)
+    assert route.model == "mistral"
+    assert not route.fallback
+
+
+def test_busy_but_not_queueing_is_not_saturated():
+    assert not busy("mistral", REPLICA_A, in_flight=2, waiting=0).saturated
+    assert not busy("mistral", REPLICA_B, in_flight=1, waiting=3).saturated
+    assert busy("phi3", REPLICA_A, in_flight=2, waiting=1).saturated
+
+
+def test_skips_models_whose_window_is_too_small():
+    # phi3's 2048 window cannot hold 1000 + min(5000, 1500) tokens; mistral's can
+    route = choose_route(PlanType.PRO, base_tokens=1000, context_tokens=5000)
+    assert route.model == "mistral"
+    busy("mistral", REPLICA_A)
+    busy("mistral", REPLICA_B)
+    # Saturated, but the fallback cannot take the prompt, so it waits for mistral
+    assert choose_route(PlanType.PRO, base_tokens=1000, context_tokens=5000).model == "mistral"
+
+
+def test_largest_window_when_no_model_fits():
+    route = choose_route(PlanType.PRO, base_tokens=9000, context_tokens=1000)
+    assert route.model == "mistral"
+
+
+def test_least_loaded_replica_for_the_model():
+    busy("mistral", REPLICA_A, in_flight=1, waiting=0)
+    assert llm.least_loaded("mistral") == REPLICA_B
+    busy("mistral", REPLICA_B, in_flight=2, waiting=0)
+    assert llm.least_loaded("mistral") == REPLICA_A
+
+
+def test_replica_ties_broken_by_load_across_models():
+    busy("phi3", REPLICA_A, in_flight=2, waiting=0)
+    assert llm.least_loaded("mistral") == REPLICA_B
+
+
+def test_generate_goes_to_the_chosen_replica():
+    seen = []
+
+    def fake_ollama(request: httpx.Request) -> httpx.Response:
+        seen.append((str(request.url), json.loads(request.content)["model"]))
+        lines = [{"response": "Hello"}, {"response": " there"}, {"done": True}]
+        return httpx.Response(200, text="\n".join(json.dumps(line) for line in lines))
+
+    for url in (REPLICA_A, REPLICA_B):
+        llm._clients[url] = httpx.AsyncClient(base_url=url, transport=httpx.MockTransport(fake_ollama))
+    busy("mistral", REPLICA_A, in_flight=1, waiting=0)
+
+    async def run():
+        try:
+            return await llm.generate("prompt", "mistral")
+        finally:
+            await llm.close_client()
+
+    assert asyncio.run(run()) == "Hello there"
+    assert seen == [(f"{REPLICA_B}/api/generate", "mistral")]
+    assert llm.get_limiter("mistral", REPLICA_B).in_flight == 0
@@ -0,0 +1,27 @@
+from app.services.retrieval import lexical_search
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, params):
+        self.statements.append((str(statement), params))
+        return []
+
+
+def test_query_words_only_reach_postgres_as_bound_parameters():
+    db = RecordingSession()
+    lexical_search(db, "tenant", "Clause 4.2 & the_thing | 'or' !", k=5)
+    [(sql, params)] = db.statements
+    assert "plainto_tsquery" in sql and "to_tsquery(" not in sql.replace("plainto_tsquery(", "")
+    assert "the_thing" not in sql and "clause" not in sql
+    assert [value for name, value in params.items() if name.startswith("term")] == [
+        "clause", "4", "2", "the_thing", "or"
+    ]
+
+
+def test_query_without_words_skips_the_database():
+    db = RecordingSession()
+    assert lexical_search(db, "tenant", "?! --", k=5) == []
+    assert db.statements == []
@@ -0,0 +1,29 @@
+import asyncio
+from collections import deque
+
+from app.services.sessions import SessionStore
+
+
+def test_record_updates_memory_and_inserts_on_a_pool(monkeypatch):
+    store = SessionStore(max_sessions=10, max_turns=3)
+    store._remember(("tenant", "s1"), deque([("q1", "a1")], maxlen=3))
+    inserted = []
+    monkeypatch.setattr(store, "_insert", lambda *turn: inserted.append(turn))
+
+    store.record("tenant", "s1", "q2", "a2").result(timeout=5)
+
+    assert store.cached_turns("tenant", "s1") == [("q1", "a1"), ("q2", "a2")]
+    assert inserted == [("tenant", "s1", "q2", "a2")]
+
+
+def test_load_reads_misses_on_the_search_pool(monkeypatch):
+    store = SessionStore(max_sessions=10, max_turns=3)
+    calls = []
+
+    def recent_turns(user_id, session_id):
+        calls.append((user_id, session_id))
+        return [("q1", "a1")]
+
+    monkeypatch.setattr(store, "recent_turns", recent_turns)
+    assert asyncio.run(store.load("tenant", "s1")) == [("q1", "a1")]
+    assert calls == [("tenant", "s1")]